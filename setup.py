@@ -17,6 +17,8 @@ def requirements(file):
 
 
 requirements_extras = {
+    "arrow": requirements("requirements_extras_arrow.txt"),
+    "numpy": requirements("requirements_extras_numpy.txt"),
     "rdkit": requirements("requirements_extras_rdkit.txt"),
 }
 requirements_extras_all = [d for extras in requirements_extras.values() for d in extras]
@@ -1,3 +1,5 @@
+import importlib.util
+
 from fastapi import FastAPI
 
 from .plugin.model import AVisynPlugin, RegHelper
@@ -25,6 +27,23 @@ class VisynPlugin(AVisynPlugin):
         # phovea_server
         registry.append_router("caleydo-idtype", "visyn_core.id_mapping.idtype_api", {})
 
+        registry.append("mapping_provider", "db_mappings", "visyn_core.id_mapping.db_mapping", {"factory": "create_db_mapping_provider"})
+
+        # Memory-mapped mapping tables, only available if the optional numpy dependency is installed
+        if importlib.util.find_spec("numpy"):
+            registry.append(
+                "mapping_provider",
+                "array_mapping_tables",
+                "visyn_core.id_mapping.array_table",
+                {"factory": "create_array_mapping_providers"},
+            )
+            registry.append(
+                "command",
+                "build-mapping-table",
+                "visyn_core.id_mapping.array_table",
+                {"factory": "create_build_mapping_table_command"},
+            )
+
         # General routers
         registry.append_router("visyn_plugin_router", "visyn_core.plugin.router", {})
         registry.append_router("visyn_xlsx_router", "visyn_core.xlsx", {})
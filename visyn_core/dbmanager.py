@@ -1,12 +1,19 @@
+import importlib.util
+import json
 import logging
+from collections.abc import AsyncIterator, Iterator
 from typing import Any
 
+import anyio
+import anyio.to_thread
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from . import manager
-from .dbview import DBConnector
+from .dbview import DBConnector, DBView
+from .dbview_cache import DBViewResultCache, create_dbview_result_cache, dbview_cache_key, security_scope
 from .middleware.close_web_sessions_middleware import CloseWebSessionsMiddleware
 from .middleware.request_context_plugin import get_request
 
@@ -19,9 +26,12 @@ class DBManager:
         self._plugins = {}
         self._engines: dict[str, Engine] = {}
         self._sessionmakers: dict[Engine, sessionmaker] = {}
+        # Shared result cache of `execute_view`, replaceable by a custom `DBViewResultCache`
+        self.view_cache: DBViewResultCache | None = None
 
     def init_app(self, app: FastAPI):
         app.add_middleware(CloseWebSessionsMiddleware)
+        self.view_cache = create_dbview_result_cache(manager.settings.visyn_core.dbview_cache)
 
         for p in manager.registry.list("tdp-sql-database-definition"):
             config: dict[str, Any] = manager.settings.get_nested(p.configKey)  # type: ignore
@@ -79,7 +89,11 @@ class DBManager:
         return self._load_engine(item)
 
     def create_session(self, engine_or_id: Engine | str) -> Session:
-        return self._sessionmakers[self.engine(engine_or_id)]()
+        engine = self.engine(engine_or_id)
+        if engine not in self._sessionmakers:
+            # Engines created outside of a connector, i.e. passed directly
+            self._sessionmakers[engine] = sessionmaker(bind=engine)
+        return self._sessionmakers[engine]()
 
     def create_web_session(self, engine_or_id: Engine | str) -> Session:
         """
@@ -98,3 +112,173 @@ class DBManager:
         existing_sessions.append(session)
 
         return session
+
+    def view(self, connector_id: str, view_name: str) -> DBView:
+        views = self.connector(connector_id).views
+        if view_name not in views:
+            raise NotImplementedError("missing db view: " + view_name)
+        return views[view_name]
+
+    def execute_view(
+        self, connector_id: str, view_name: str, args=None, replacements=None, filters=None, query_key=None
+    ) -> list[dict[str, Any]]:
+        """
+        Executes a view of a connector (see `DBView.execute`), caching its results in `view_cache` if the view declares a TTL via
+        `DBViewBuilder.cache` and does not set `no_cache`. Results are shared by all users of the same security scope (see `security_scope`),
+        i.e. the access has to be checked via `DBView.can_access` beforehand as for uncached views.
+        """
+        view = self.view(connector_id, view_name)
+        engine = self.engine(connector_id)
+        if self.view_cache is None or view.no_cache or view.cache_ttl is None:
+            return view.execute(engine, args, replacements, filters, query_key)
+
+        key = dbview_cache_key(connector_id, view_name, query_key, security_scope(view), args, replacements, filters)
+        try:
+            rows = self.view_cache.get(key)
+        except Exception:
+            # An unavailable cache must not fail the query
+            _log.exception(f"Error reading the cached results of view {view_name}")
+            rows = None
+        if rows is not None:
+            return rows
+
+        rows = view.execute(engine, args, replacements, filters, query_key)
+        try:
+            self.view_cache.set(key, rows, view.cache_ttl, view.cache_tables or ([view.table] if view.table else []))
+        except Exception:
+            _log.exception(f"Error caching the results of view {view_name}")
+        return rows
+
+    def invalidate_view_cache(self, table: str | None = None):
+        """
+        Removes the cached results of all views reading from the given table, or all cached results if no table is given.
+        """
+        if self.view_cache is not None:
+            self.view_cache.invalidate(table)
+
+    def stream_view_partitions(
+        self,
+        engine_or_id: Engine | str,
+        view: DBView,
+        args=None,
+        replacements=None,
+        filters=None,
+        query_key=None,
+        chunk_size: int = 1000,
+    ) -> Iterator[tuple[list[str], list]]:
+        """
+        Executes a view (see `DBView.prepare`) using a server-side cursor, yielding its column names along with the next `chunk_size` rows.
+        Only one chunk is held in memory at a time, and the connection is returned to the pool once the generator is exhausted or closed.
+        Queries without rows yield their column names once with an empty chunk.
+        """
+        query = view.query if query_key is None else view.queries.get(query_key)
+        if callable(query):
+            # Callbacks return all rows at once as dicts
+            rows = query(self.engine(engine_or_id), args or {}, filters or {})
+            names = list(rows[0]) if rows else []
+            for start in range(0, len(rows), chunk_size):
+                yield names, [tuple(row.values()) for row in rows[start : start + chunk_size]]
+            return
+
+        statement, params = view.prepare(args, replacements, filters, query_key)
+        session = self.create_session(engine_or_id)
+        try:
+            result = session.execute(statement, params, execution_options={"stream_results": True, "yield_per": chunk_size})
+            names = list(result.keys())
+            empty = True
+            for partition in result.partitions(chunk_size):
+                empty = False
+                yield names, partition
+            if empty:
+                yield names, []
+        finally:
+            session.close()
+
+    def stream_view(
+        self,
+        engine_or_id: Engine | str,
+        view: DBView,
+        args=None,
+        replacements=None,
+        filters=None,
+        query_key=None,
+        chunk_size: int = 1000,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Executes a view like `stream_view_partitions`, yielding its rows in chunks of `chunk_size` dicts.
+        """
+        partitions = self.stream_view_partitions(engine_or_id, view, args, replacements, filters, query_key, chunk_size)
+        try:
+            for names, rows in partitions:
+                if rows:
+                    yield [dict(zip(names, row, strict=True)) for row in rows]
+        finally:
+            partitions.close()
+
+    def stream_view_response(
+        self,
+        engine_or_id: Engine | str,
+        view: DBView,
+        args=None,
+        replacements=None,
+        filters=None,
+        query_key=None,
+        chunk_size: int = 1000,
+        accept: str | None = None,
+    ) -> StreamingResponse:
+        """
+        Streams the rows of a view (see `stream_view_partitions`), negotiating the format via the given Accept header:
+        one JSON line per row by default, or an Arrow IPC stream with one record batch per chunk (requires pyarrow, i.e. visyn_core[arrow]).
+        The query is only executed once the response is sent.
+        """
+        partitions = self.stream_view_partitions(engine_or_id, view, args, replacements, filters, query_key, chunk_size)
+        if _negotiate_media_type(accept, _media_types()) == ARROW_STREAM_MEDIA_TYPE:
+            from .dbview_arrow import arrow_batches, write_arrow_stream
+
+            return StreamingResponse(
+                _iterate_in_threadpool(write_arrow_stream(arrow_batches(view, partitions)), partitions), media_type=ARROW_STREAM_MEDIA_TYPE
+            )
+
+        def generate_lines():
+            for names, rows in partitions:
+                if rows:
+                    yield "".join(f"{json.dumps(dict(zip(names, row, strict=True)), default=str)}\n" for row in rows)
+
+        return StreamingResponse(_iterate_in_threadpool(generate_lines(), partitions), media_type=NDJSON_MEDIA_TYPE)
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _media_types() -> list[str]:
+    # Arrow is only offered if the optional pyarrow dependency is installed
+    return [NDJSON_MEDIA_TYPE, ARROW_STREAM_MEDIA_TYPE] if importlib.util.find_spec("pyarrow") else [NDJSON_MEDIA_TYPE]
+
+
+def _negotiate_media_type(accept: str | None, media_types: list[str]) -> str:
+    """
+    Returns the media type of `media_types` with the highest quality in the Accept header, or the first one if none of them is accepted.
+    """
+    best, best_quality = media_types[0], 0.0
+    for part in (accept or "").split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        quality = next((float(p[2:]) for p in params if p.startswith("q=") and p[2:].replace(".", "", 1).isdigit()), 1.0)
+        if media_type in media_types and quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+async def _iterate_in_threadpool(iterator: Iterator, closeable: Iterator) -> AsyncIterator:
+    """
+    Like `starlette.concurrency.iterate_in_threadpool`, but closes the underlying generator if the client disconnects,
+    such that its database connection is returned to the pool immediately instead of on garbage collection.
+    """
+    done = object()
+    try:
+        while (item := await anyio.to_thread.run_sync(next, iterator, done)) is not done:
+            yield item
+    finally:
+        # The response task is cancelled on disconnect, so the close is shielded to run it nonetheless
+        with anyio.CancelScope(shield=True):
+            await anyio.to_thread.run_sync(closeable.close)  # type: ignore
@@ -1,11 +1,16 @@
+import base64
+import json
 import logging
 import re
+import threading
 from collections import OrderedDict
 from typing import Any
 
 import sqlalchemy
+from cachetools import LRUCache
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.elements import TextClause
 
 from .security import current_user, is_logged_in
 from .utils import clean_query
@@ -39,6 +44,45 @@ class DBFilterData:
         self.join = join
 
 
+class DBViewStatementCache:
+    """
+    Bounded and thread-safe cache of the compiled statements of `DBView.execute`, keyed by view, query key, replacement values and filter shape.
+    Entries are evicted in least-recently-used order once `maxsize` is reached.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compile(self, key: tuple, compile) -> TextClause:
+        with self._lock:
+            statement = self._cache.get(key)
+            if statement is not None:
+                self.hits += 1
+                return statement
+            self.misses += 1
+        # Compile outside of the lock, as concurrent compilations of the same key yield equal statements
+        statement = compile()
+        with self._lock:
+            self._cache[key] = statement
+        return statement
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize}
+
+
+statement_cache = DBViewStatementCache()
+"""Compiled statements of all views, see `DBView.execute`."""
+
+
 class DBView:
     def __init__(self, idtype=None, query=None):
         self.description = ""
@@ -58,6 +102,10 @@ class DBView:
         self.table = None
         self.security = None
         self.no_cache = False
+        self.cache_ttl: float | None = None
+        self.cache_tables: list[str] = []
+        self.keyset_columns: list[str] = []
+        self.keyset_limit = "n"
 
     def needs_to_fill_up_columns(self):
         return self.columns_filled_up is False and self.table is not None
@@ -118,17 +166,18 @@ class DBView:
         v = self.valid_replacements[key]
         if isinstance(v, list):
             return value in v
-        if isinstance(v, int):
+        # int and float are given as types, i.e. .replace("limit", int)
+        if v is int or isinstance(v, int):
             try:
                 int(value)  # try to cast value to int
                 return True  # successful type cast
-            except ValueError:
+            except (TypeError, ValueError):
                 return False
-        if isinstance(v, float):
+        if v is float or isinstance(v, float):
             try:
                 float(value)  # try to cast value to float
                 return True  # successful type cast
-            except ValueError:
+            except (TypeError, ValueError):
                 return False
         if isinstance(v, REGEX_TYPE):
             return v.match(value)
@@ -141,6 +190,131 @@ class DBView:
     def get_argument_info(self, key):
         return self.argument_infos.get(key)
 
+    def prepare(self, args=None, replacements=None, filters=None, query_key=None) -> tuple[TextClause, dict[str, Any]]:
+        """
+        validates the given values and returns the compiled statement of the query along with its bound parameters.
+        the statement is cached in `statement_cache` by view, query key, replacement values and filter shape, such that hot views skip
+        the string formatting and parsing of the query.
+        :param args: dict of argument values (using :arg), lists for arguments declared with as_list
+        :param replacements: dict of replacement values (using {replacement}), validated via valid_replacements
+        :param filters: dict of filter key to a value or list of values, keys prefixed with ! are negated
+        :param query_key: optional key of the query in queries, otherwise the default query is used
+        :return: tuple of the statement and its parameters
+        """
+        query = self.query if query_key is None else self.queries.get(query_key)
+        if query is None:
+            raise ValueError(f"unknown query: {query_key}")
+        if callable(query):
+            raise ValueError("cannot prepare a callback query")
+
+        params = self.__prepare_arguments(args or {})
+        list_params = [key for key in self.arguments if self.argument_infos.get(key) and self.argument_infos[key].as_list]
+
+        # The shape of the filters, i.e. the key, negation and whether a list is given, determines the generated SQL
+        filter_shape = []
+        for i, (key, value) in enumerate(sorted((filters or {}).items())):
+            negated = key.startswith("!")
+            name = key[1:] if negated else key
+            if not self.is_valid_filter(name):
+                raise ValueError(f"invalid filter: {name}")
+            as_list = isinstance(value, list | tuple | set)
+            params[f"filter_{i}"] = list(value) if as_list else value
+            filter_shape.append((name, negated, as_list))
+            if as_list:
+                list_params.append(f"filter_{i}")
+
+        replacement_values = {}
+        generated = self.__generated_replacements()
+        for key, value in (replacements or {}).items():
+            # The where clauses and joins are only generated from the validated filters
+            if key in generated or not self.is_valid_replacement(key, value):
+                raise ValueError(f"invalid replacement: {key}")
+            replacement_values[key] = str(value)
+
+        cache_key = (self, query_key, tuple(sorted(replacement_values.items())), tuple(filter_shape))
+        statement = statement_cache.get_or_compile(cache_key, lambda: self.__compile(query, replacement_values, filter_shape, list_params))
+        return statement, params
+
+    def execute(self, engine: Engine, args=None, replacements=None, filters=None, query_key=None) -> list[dict[str, Any]]:
+        """
+        executes the query of this view with the given values, see `prepare`. callback queries are called with the engine, arguments and filters.
+        :return: list of rows as dicts
+        """
+        query = self.query if query_key is None else self.queries.get(query_key)
+        if callable(query):
+            return query(engine, args or {}, filters or {})
+        statement, params = self.prepare(args, replacements, filters, query_key)
+        with engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(statement, params)]
+
+    def paginate(
+        self, engine: Engine, cursor=None, limit=100, args=None, replacements=None, filters=None
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        executes a page of a view paginated via keyset_paginate
+        :param cursor: the cursor token of the previous page, or None for the first page
+        :param limit: the page size
+        :return: tuple of the rows and the cursor token of the next page, which is None after the last page
+        """
+        if not self.keyset_columns:
+            raise ValueError("view is not paginated via keyset_paginate")
+        after = decode_cursor(cursor, len(self.keyset_columns)) if cursor else [None] * len(self.keyset_columns)
+        page_args = {**(args or {}), **{f"after_{i}": value for i, value in enumerate(after)}, self.keyset_limit: limit}
+        rows = self.execute(engine, page_args, replacements, filters)
+        next_cursor = encode_cursor(rows[-1][column] for column in self.keyset_columns) if rows and len(rows) >= limit else None
+        return rows, next_cursor
+
+    def __prepare_arguments(self, args: dict) -> dict[str, Any]:
+        params = {}
+        for key, value in args.items():
+            if not self.is_valid_argument(key):
+                raise ValueError(f"invalid argument: {key}")
+            info = self.get_argument_info(key)
+            if info is not None and info.as_list:
+                values = list(value) if isinstance(value, list | tuple | set) else [value]
+                params[key] = [info.type(v) for v in values] if info.type else values
+            else:
+                params[key] = info.type(value) if info is not None and info.type else value
+        missing = [key for key in self.arguments if key not in params]
+        if missing:
+            raise ValueError(f"missing arguments: {', '.join(dict.fromkeys(missing))}")
+        return params
+
+    def __generated_replacements(self) -> set[str]:
+        keys = {"where", "and_where", "joins"}
+        for group in self.filter_groups():
+            keys.update((f"{group}_where", f"and_{group}_where"))
+        return keys
+
+    def __compile(self, query: str, replacements: dict[str, str], filter_shape: list, list_params: list[str]) -> TextClause:
+        # The where clauses and joins of the filters are injected via the where/and_where/joins replacements of `inject_where`
+        where: dict[str | None, list[str]] = {}
+        joins = []
+        for i, (key, negated, as_list) in enumerate(filter_shape):
+            operator = ("NOT IN" if negated else "IN") if as_list else ("<>" if negated else "=")
+            where.setdefault(self.get_filter_group(key), []).append(
+                "(" + self.get_filter_subquery(key).format(operator=operator, value=f":filter_{i}") + ")"
+            )
+            join = self.get_filter_subjoin(key)
+            if join and join not in joins:
+                joins.append(join)
+
+        values = dict(replacements)
+        for group in {None, *self.filter_groups(), *where}:
+            clauses = " AND ".join(where.get(group, []))
+            prefix = "" if group is None else f"{group}_"
+            values[f"{prefix}where"] = f"WHERE {clauses}" if clauses else ""
+            values[f"and_{prefix}where"] = f"AND {clauses}" if clauses else ""
+        values["joins"] = " ".join(joins)
+
+        missing = [key for key in self.replacements if key not in values]
+        if missing:
+            raise ValueError(f"missing replacements: {', '.join(missing)}")
+
+        statement = sqlalchemy.text(query.format(**values))
+        expanding = [sqlalchemy.bindparam(key, expanding=True) for key in dict.fromkeys(list_params) if key in statement._bindparams]
+        return statement.bindparams(*expanding) if expanding else statement
+
     # TODO: improve the logic of this function, because even for unauthorized can_access returns True, i.e. that the user can access the resource. Somewhere else the server checks whether the user is authenticated or not
     def can_access(self, check_default_security=False):
         """
@@ -195,6 +369,10 @@ class DBViewBuilder:
         self.v.valid_replacements = view.valid_replacements.copy()
         self.v.security = view.security
         self.v.no_cache = view.no_cache
+        self.v.cache_ttl = view.cache_ttl
+        self.v.cache_tables = list(view.cache_tables)
+        self.v.keyset_columns = list(view.keyset_columns)
+        self.v.keyset_limit = view.keyset_limit
         return self
 
     def description(self, desc, summary=None):
@@ -402,6 +580,17 @@ class DBViewBuilder:
         self.v.no_cache = True
         return self
 
+    def cache(self, ttl, tables=None):
+        """
+        caches the results of this view on the server for ttl seconds, if the dbview_cache setting is enabled. ignored for no_cache views
+        :param ttl: time to live of the cached results in seconds
+        :param tables: optional names of the tables the view reads from, whose invalidation removes the cached results (default: the table)
+        :return: self
+        """
+        self.v.cache_ttl = ttl
+        self.v.cache_tables = list(tables or [])
+        return self
+
     def build(self):
         """
         builds the query and end this builder
@@ -419,6 +608,51 @@ def limit_offset(builder):
     return builder.append(" LIMIT {limit} OFFSET {offset}").replace("limit", int).replace("offset", int).arg("query")
 
 
+def keyset_paginate(builder, keys, columns, limit="n"):
+    """
+    helper function for keyset pagination as an alternative to limit_offset, such that every page costs the same at any depth:
+    injects `(key, ...) > (:after_0, ...)` into the where clause and appends `LIMIT :n`. the query has to be ordered ascending by the keys,
+    which have to identify a row uniquely. pages are fetched via DBView.paginate, passing the cursor token of the previous page
+    :param builder: the current builder
+    :param keys: the SQL expressions of the keys, i.e. ["{column}", "id"]
+    :param columns: the result columns of the keys, i.e. ["text", "id"], from which the cursor token of the next page is built
+    :param limit: name of the argument of the page size
+    :return: builder
+    """
+    after = [f":after_{i}" for i in range(len(keys))]
+    # Rows are compared as a whole if there are multiple keys, i.e. (a, b) > (x, y)
+    comparison = f"{keys[0]} > {after[0]}" if len(keys) == 1 else f"({', '.join(keys)}) > ({', '.join(after)})"
+    # The first page is fetched without a cursor, i.e. with :after_0 being NULL
+    inject_where_clause(builder, f"{after[0]} IS NULL OR {comparison}")
+    builder.append(f" LIMIT :{limit}")
+    for i in range(len(keys)):
+        builder.arg(f"after_{i}", description="key of the last row of the previous page")
+    builder.arg(limit, type=int, description="page size")
+    builder.v.keyset_columns = list(columns)
+    builder.v.keyset_limit = limit
+    return builder
+
+
+def encode_cursor(values) -> str:
+    """
+    encodes the key values of the last row of a page into an opaque cursor token
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token, length) -> list:
+    """
+    decodes a cursor token of encode_cursor into its key values
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError("invalid cursor")
+    return values
+
+
 def inject_where_clause(builder, clause):
     """
     helper function to inject an additional where clause
@@ -444,7 +678,7 @@ def inject_where_clause(builder, clause):
             # append
             builder.append(" WHERE ").append(clause)
         else:
-            builder.query(f"{query[:index]} WHERE {clause} {query[index:]}")
+            builder.query(f"{query[:before]} WHERE {clause} {query[before:]}")
     return builder
 
 
@@ -493,6 +727,7 @@ def add_common_queries(
     call_function=None,
     prefix=None,
     name_column="name",
+    cache_ttl=None,
 ):
     """
     create a set of common queries
@@ -504,6 +739,7 @@ def add_common_queries(
     :param call_function: another call function
     :param prefix: optional prefix instead of the table name
     :param name_column: name of the name column used to verify items
+    :param cache_ttl: optional time to live of the cached results of the queries returning the same results for every user, see DBViewBuilder.cache
     :return: None
     """
     if prefix is None:
@@ -538,6 +774,7 @@ def add_common_queries(
         .call(call_function)
         .call(inject_where)
         .filter(name_column, f"lower({name_column}) {{operator}} {{value}}")
+        .cache(cache_ttl, [table])
         .build()
     )
 
@@ -558,6 +795,43 @@ def add_common_queries(
         .build()
     )
 
+    # Keyset paginated variants of the lookups above, see DBView.paginate
+    id_key = _id_expression(id_query)
+    queries[prefix + "_items_keyset"] = (
+        DBViewBuilder("lookup")
+        .idtype(idtype)
+        .table(table)
+        .query(
+            f"""
+        SELECT {id_query}, {{column}} AS text
+        FROM {table} WHERE LOWER({{column}}) LIKE :query
+        ORDER BY {{column}} ASC, {id_key} ASC"""
+        )
+        .replace("column", columns)
+        .call(call_function)
+        .call(lambda builder: keyset_paginate(builder, ["{column}", id_key], ["text", "id"]))
+        .arg("query")
+        .build()
+    )
+
+    queries[prefix + "_unique_keyset"] = (
+        DBViewBuilder("lookup")
+        .query(
+            f"""
+        SELECT d as id, d as text
+        FROM (
+          SELECT distinct {{column}} AS d
+          FROM {table} WHERE LOWER({{column}}) LIKE :query
+          ) as t
+        ORDER BY d ASC"""
+        )
+        .replace("column", columns)
+        # The distinct values are unique, i.e. the column itself is the key, compared within the subquery
+        .call(lambda builder: keyset_paginate(builder, ["{column}"], ["id"]))
+        .arg("query")
+        .build()
+    )
+
     queries[prefix + "_unique_all"] = (
         DBViewBuilder("helper")
         .query(
@@ -566,10 +840,19 @@ def add_common_queries(
         FROM {table} ORDER BY {{column}} ASC """
         )
         .replace("column", columns)
+        .cache(cache_ttl, [table])
         .build()
     )
 
 
+def _id_expression(id_query):
+    """
+    returns the expression of an id snippet like 'ensg AS id', i.e. to compare it in a where clause
+    """
+    match = re.match(r"^\s*(.+?)\s+as\s+id\s*$", id_query, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else id_query
+
+
 """
  default aggregation
 """
@@ -0,0 +1,77 @@
+import io
+from collections.abc import Iterable, Iterator
+
+import pyarrow as pa
+
+from .dbview import DBView
+
+# Arrow types of the column types recorded via `DBViewBuilder.column(name, type=...)`, other columns are inferred from the first batch
+ARROW_TYPES = {
+    "string": pa.string(),
+    "categorical": pa.dictionary(pa.int32(), pa.string()),
+    "number": pa.float64(),
+    "int": pa.int64(),
+    "integer": pa.int64(),
+    "boolean": pa.bool_(),
+}
+
+
+def column_type(view: DBView, name: str) -> pa.DataType | None:
+    column = view.columns.get(name)
+    return ARROW_TYPES.get(column.get("type")) if column else None
+
+
+def to_arrow_array(values: list, type: pa.DataType | None) -> pa.Array:
+    if type is None:
+        return pa.array(values)
+    try:
+        return pa.array(values, type=type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # i.e. decimals of a numeric column, which are only converted via a cast
+        return pa.array(values).cast(type)
+
+
+def arrow_batches(view: DBView, partitions: Iterable[tuple[list[str], list]]) -> Iterator[pa.RecordBatch]:
+    """
+    Converts (column names, rows) partitions of a cursor (see `DBManager.stream_view_partitions`) into record batches,
+    building every column directly from the rows. The schema is derived from the column metadata of the view,
+    and the types of the remaining columns are inferred from the first partition (strings if it contains no values).
+    """
+    schema: pa.Schema | None = None
+    for names, rows in partitions:
+        columns = list(zip(*rows, strict=True)) if rows else [() for _ in names]
+        if schema is None:
+            arrays = [to_arrow_array(list(values), column_type(view, name)) for name, values in zip(names, columns, strict=True)]
+            schema = pa.schema(
+                [
+                    pa.field(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                    for name, array in zip(names, arrays, strict=True)
+                ]
+            )
+            arrays = [array.cast(field.type) if array.type != field.type else array for array, field in zip(arrays, schema, strict=True)]
+        else:
+            arrays = [to_arrow_array(list(values), field.type) for values, field in zip(columns, schema, strict=True)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_arrow_stream(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """
+    Serializes record batches as an Arrow IPC stream, yielding the bytes of every batch (the first one including the schema) as soon as it is written.
+    """
+    sink = io.BytesIO()
+    writer = None
+    for batch in batches:
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield _drain(sink)
+    if writer is not None:
+        writer.close()
+        yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
@@ -0,0 +1,188 @@
+import base64
+import copy
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any
+
+import redis
+from cachetools import LRUCache
+
+from .dbview import DBView
+from .security import current_user
+from .settings.model import DBViewCacheSettings
+from .settings.utils import get_default_redis_url
+
+_log = logging.getLogger(__name__)
+
+
+def security_scope(view: DBView) -> str:
+    """
+    Returns the scope of users sharing the cached results of a view: everyone for views without security,
+    everyone with the role of views secured by a role, and only the current user for views secured by a function.
+    The access itself is still checked via `DBView.can_access` before a view is executed.
+    """
+    if view.security is None or view.security is False:
+        return "public"
+    if isinstance(view.security, str):
+        return f"role:{view.security}"
+    return f"user:{current_user().id}"
+
+
+def dbview_cache_key(
+    connector_id: str, view_name: str, query_key: str | None, scope: str, args=None, replacements=None, filters=None
+) -> str:
+    """
+    Returns the cache key of a view execution, normalizing the arguments such that the order of their keys does not matter.
+    """
+    normalized = json.dumps(
+        [connector_id, view_name, query_key, scope, args or {}, replacements or {}, filters or {}], sort_keys=True, default=str
+    )
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class DBViewResultCache(ABC):
+    """
+    Result cache of DBView executions, keyed by `dbview_cache_key`. Every entry expires after the TTL of its view,
+    and is invalidated along with the tables it was read from.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> list | None:
+        """
+        Returns the cached rows, or None if they are not cached.
+        """
+
+    @abstractmethod
+    def set(self, key: str, rows: list, ttl: float, tables: list[str]):
+        """
+        Caches the rows for `ttl` seconds, tracking the tables they were read from.
+        """
+
+    @abstractmethod
+    def invalidate(self, table: str | None = None):
+        """
+        Removes all cached results read from the given table, or all cached results if no table is given.
+        """
+
+
+class MemoryDBViewResultCache(DBViewResultCache):
+    """
+    Bounded and thread-safe cache in the memory of the process, evicting the least recently used results once `maxsize` is reached.
+    The rows are copied when they are cached and returned, such that callers modifying them do not change the cached results.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list | None:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, _, rows = entry
+            if expires_at < time.monotonic():
+                del self._cache[key]
+                return None
+        return copy.deepcopy(rows)
+
+    def set(self, key: str, rows: list, ttl: float, tables: list[str]):
+        rows = copy.deepcopy(rows)
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, frozenset(tables), rows)
+
+    def invalidate(self, table: str | None = None):
+        with self._lock:
+            if table is None:
+                self._cache.clear()
+                return
+            for key in [key for key, (_, tables, _) in self._cache.items() if table in tables]:
+                del self._cache[key]
+
+
+# Values of database columns without a JSON type, stored as {"__dbview_type__": name, "value": ...} to be restored on cache hits
+_JSON_TYPES: dict[str, tuple[type, Any, Any]] = {
+    # datetime is a subclass of date, i.e. it has to be checked first
+    "datetime": (datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    "date": (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    "time": (datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    "timedelta": (datetime.timedelta, datetime.timedelta.total_seconds, lambda value: datetime.timedelta(seconds=value)),
+    "decimal": (decimal.Decimal, str, decimal.Decimal),
+    "uuid": (uuid.UUID, str, uuid.UUID),
+    "bytes": (bytes, lambda value: base64.b64encode(value).decode("ascii"), base64.b64decode),
+}
+_TYPE_KEY = "__dbview_type__"
+
+
+def _encode_json_value(value):
+    for name, (type_, encode, _) in _JSON_TYPES.items():
+        if isinstance(value, type_):
+            return {_TYPE_KEY: name, "value": encode(value)}
+    raise TypeError(f"Object of type {type(value).__name__} cannot be cached")
+
+
+def _decode_json_value(obj: dict):
+    if len(obj) == 2 and obj.get(_TYPE_KEY) in _JSON_TYPES and "value" in obj:
+        return _JSON_TYPES[obj[_TYPE_KEY]][2](obj["value"])
+    return obj
+
+
+class RedisDBViewResultCache(DBViewResultCache):
+    """
+    Cache in Redis shared by all processes. The rows are stored as JSON, with dates, times, decimals, UUIDs and bytes tagged by their type,
+    such that a cache hit returns the same types as the query itself. Rows with values of other non-JSON types cannot be cached.
+    The keys of the results read from a table are tracked in a set per table, which is removed on invalidation (requires Redis 7).
+    """
+
+    def __init__(self, client, key_prefix: str = "visyn_core:dbview:"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get(self, key: str) -> list | None:
+        value = self.client.get(self.key_prefix + key)
+        return json.loads(value, object_hook=_decode_json_value) if value is not None else None
+
+    def set(self, key: str, rows: list, ttl: float, tables: list[str]):
+        seconds = max(1, math.ceil(ttl))
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(self.key_prefix + key, json.dumps(rows, default=_encode_json_value), ex=seconds)
+        for table in tables:
+            table_key = self.__table_key(table)
+            pipeline.sadd(table_key, self.key_prefix + key)
+            # The set only has to outlive the results it tracks
+            pipeline.expire(table_key, seconds, gt=True)
+            pipeline.expire(table_key, seconds, nx=True)
+        pipeline.execute()
+
+    def invalidate(self, table: str | None = None):
+        if table is None:
+            keys = list(self.client.scan_iter(match=f"{self.key_prefix}*"))
+        else:
+            table_key = self.__table_key(table)
+            keys = [*self.client.smembers(table_key), table_key]
+        if keys:
+            self.client.delete(*keys)
+
+    def __table_key(self, table: str) -> str:
+        return f"{self.key_prefix}table:{table}"
+
+
+def create_dbview_result_cache(settings: DBViewCacheSettings) -> DBViewResultCache | None:
+    """
+    Creates the result cache of the configured backend, or returns None if caching is disabled.
+    """
+    if not settings.enabled:
+        return None
+    if settings.backend == "redis":
+        config: dict[str, Any] = settings.redis or get_default_redis_url()
+        _log.info(f"Caching DBView results in Redis at {config['host']}:{config['port']}/{config['db']}")
+        return RedisDBViewResultCache(redis.Redis(host=config["host"], port=config["port"], db=config["db"]), settings.key_prefix)
+    return MemoryDBViewResultCache(settings.maxsize)
@@ -0,0 +1,229 @@
+import csv
+import json
+import logging
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+from .. import manager
+
+_log = logging.getLogger(__name__)
+
+META_FILE = "meta.json"
+KEYS_FILE = "keys.npy"
+OFFSETS_FILE = "offsets.npy"
+TARGETS_FILE = "targets.npy"
+POOL_FILE = "pool.npy"
+
+_INT64_MIN, _INT64_MAX = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+
+
+def _to_array(ids: list, integer_ids: bool) -> np.ndarray:
+    if integer_ids:
+        return np.array([int(id) for id in ids], dtype=np.int64)
+    # Fixed-width byte strings are compared bytewise, i.e. in the same order as the sorted keys on disk
+    return np.array([str(id).encode("utf-8") for id in ids], dtype=np.bytes_)
+
+
+def _parse_integer_ids(ids: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parses the ids of a query of an integer table, returning them along with a mask of the parsable ones (the others are not found).
+    """
+    parsed = []
+    for id in ids:
+        try:
+            value = int(id)
+        except (TypeError, ValueError):
+            value = None
+        parsed.append(value if value is not None and _INT64_MIN <= value <= _INT64_MAX else None)
+    valid = np.array([value is not None for value in parsed], dtype=bool)
+    return np.array([0 if value is None else value for value in parsed], dtype=np.int64), valid
+
+
+def _from_array(values: np.ndarray, integer_ids: bool) -> list:
+    if integer_ids:
+        return values.tolist()
+    return [v.decode("utf-8") for v in values.tolist()]
+
+
+class ArrayMappingTable:
+    """
+    Read-only mapping table backed by memory-mapped NumPy arrays, as written by `build_array_mapping_table`:
+    the sorted keys, the offsets of the mapped ids of every key, and the flat mapped ids as indices into a sorted pool of unique ids.
+    Lookups use a vectorized binary search, and as the files are mapped read-only, all worker processes share the same pages.
+    Tables built with `reversible=True` also provide the reverse edge, which is derived from `items()` by the `MappingManager`.
+    """
+
+    preserves_order = True
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        meta = json.loads((self.path / META_FILE).read_text())
+        self.from_idtype: str = meta["from_idtype"]
+        self.to_idtype: str = meta["to_idtype"]
+        self.integer_ids: bool = meta.get("integer_ids", False)
+        self.reversible: bool = meta.get("reversible", False)
+        self._keys = np.load(self.path / KEYS_FILE, mmap_mode="r")
+        self._offsets = np.load(self.path / OFFSETS_FILE, mmap_mode="r")
+        self._targets = np.load(self.path / TARGETS_FILE, mmap_mode="r")
+        self._pool = np.load(self.path / POOL_FILE, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def keys(self) -> list:
+        return _from_array(self._keys, self.integer_ids)
+
+    def items(self):
+        """
+        Yields every key with its mapped ids, in the sorted order of the keys.
+        """
+        values = _from_array(self._pool[self._targets], self.integer_ids)
+        offsets = self._offsets.tolist()
+        for i, key in enumerate(self.keys()):
+            yield key, values[offsets[i] : offsets[i + 1]]
+
+    def __call__(self, ids: list, first_only: bool = False) -> list[list]:
+        """
+        Maps the ids, returning only the first mapped id of every id with `first_only`.
+        """
+        if not ids or not len(self._keys):
+            return [[] for _ in ids]
+
+        if self.integer_ids:
+            query, valid = _parse_integer_ids(ids)
+        else:
+            query, valid = _to_array(ids, False), None
+        rows = np.minimum(np.searchsorted(self._keys, query), len(self._keys) - 1)
+        found = self._keys[rows] == query
+        if valid is not None:
+            found &= valid
+        starts = np.where(found, self._offsets[rows], 0)
+        lengths = np.where(found, self._offsets[rows + 1] - starts, 0)
+        if first_only:
+            lengths = np.minimum(lengths, 1)
+
+        # Gather the mapped ids of all found keys at once, i.e. the ranges [start, start + length) of the flat targets
+        total = int(lengths.sum())
+        ends = np.cumsum(lengths)
+        positions = np.repeat(starts - (ends - lengths), lengths) + np.arange(total)
+        values = _from_array(self._pool[self._targets[positions]], self.integer_ids)
+
+        results = []
+        end = 0
+        for length in lengths.tolist():
+            results.append(values[end : end + length])
+            end += length
+        return results
+
+
+def build_array_mapping_table(
+    path: str | Path, from_idtype: str, to_idtype: str, pairs: Iterable[tuple], *, integer_ids: bool = False, reversible: bool = False
+) -> int:
+    """
+    Builds the files of an `ArrayMappingTable` from (from_id, to_id) pairs, returning the number of keys.
+    Duplicate pairs are dropped, and the mapped ids of a key keep the order of their first occurrence.
+    Every file is written to a temporary file first and then renamed, such that running workers keep reading the previous table.
+    """
+    grouped: dict = {}
+    for from_id, to_id in pairs:
+        if from_id is None or to_id is None:
+            continue
+        targets = grouped.setdefault(int(from_id) if integer_ids else str(from_id), {})
+        targets[int(to_id) if integer_ids else str(to_id)] = None
+
+    keys = _to_array(list(grouped.keys()), integer_ids)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    grouped_targets = list(grouped.values())
+    sorted_targets = [grouped_targets[i] for i in order.tolist()]
+
+    pool = np.unique(_to_array(list({t: None for targets in sorted_targets for t in targets}), integer_ids))
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(targets) for targets in sorted_targets], out=offsets[1:])
+    flat = _to_array([t for targets in sorted_targets for t in targets], integer_ids)
+    index_dtype = np.int32 if len(pool) < np.iinfo(np.int32).max else np.int64
+    targets = np.searchsorted(pool, flat).astype(index_dtype) if len(flat) else np.zeros(0, dtype=index_dtype)
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, array in ((KEYS_FILE, keys), (OFFSETS_FILE, offsets), (TARGETS_FILE, targets), (POOL_FILE, pool)):
+        tmp = path / f".{name}.tmp"
+        with tmp.open("wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path / name)
+    tmp = path / f".{META_FILE}.tmp"
+    tmp.write_text(json.dumps({"from_idtype": from_idtype, "to_idtype": to_idtype, "integer_ids": integer_ids, "reversible": reversible}))
+    os.replace(tmp, path / META_FILE)
+
+    _log.info(f"Built mapping table {from_idtype} -> {to_idtype} with {len(keys)} keys and {len(flat)} mapped ids at {path}")
+    return len(keys)
+
+
+def read_csv_pairs(file: str, from_column: str | None = None, to_column: str | None = None, delimiter: str = ","):
+    """
+    Reads (from_id, to_id) pairs from a CSV file with a header, using the first two columns if no column names are given.
+    """
+    with open(file, newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, [])
+        from_index = header.index(from_column) if from_column else 0
+        to_index = header.index(to_column) if to_column else 1
+        for row in reader:
+            if row:
+                yield row[from_index], row[to_index]
+
+
+def read_sql_pairs(db: str, query: str):
+    """
+    Reads (from_id, to_id) pairs from the first two columns of a query, i.e. `select from_id as f, to_id as t from mapping_table`.
+    The database is either the id of a registered database connector or a database url.
+    """
+    import sqlalchemy
+
+    engine = manager.db.engine(db) if db in manager.db.connectors else sqlalchemy.create_engine(db)
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for row in conn.execute(sqlalchemy.text(query)):
+            yield row[0], row[1]
+
+
+def create_array_mapping_providers():
+    """
+    Creates an `ArrayMappingTable` for every directory of the `array_tables` setting, used by the 'mapping_provider' extension point.
+    """
+    for path in manager.settings.visyn_core.id_mapping.array_tables:
+        table = ArrayMappingTable(path)
+        _log.info(f"Loaded mapping table {table.from_idtype} -> {table.to_idtype} with {len(table)} keys from {path}")
+        yield table.from_idtype, table.to_idtype, table
+
+
+def create_build_mapping_table_command(parser):
+    """
+    Creates a command building an `ArrayMappingTable` from a CSV file or SQL query, used by the 'command' extension point.
+    """
+    parser.add_argument("output", help="Directory of the mapping table")
+    parser.add_argument("--from-idtype", required=True, help="Idtype of the keys")
+    parser.add_argument("--to-idtype", required=True, help="Idtype of the mapped ids")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file with a header and one (from_id, to_id) pair per row")
+    source.add_argument("--sql", help="SQL query returning one (from_id, to_id) pair per row")
+    parser.add_argument("--from-column", help="Column of the keys in the CSV file (default: first column)")
+    parser.add_argument("--to-column", help="Column of the mapped ids in the CSV file (default: second column)")
+    parser.add_argument("--delimiter", default=",", help="Delimiter of the CSV file")
+    parser.add_argument("--db", help="Database connector id or database url of the SQL query")
+    parser.add_argument("--integer-ids", action="store_true", help="Store the ids as integers instead of strings")
+    parser.add_argument("--reversible", action="store_true", help="Also provide the mapping from the mapped ids back to the keys")
+
+    def execute(args):
+        if args.sql and not args.db:
+            parser.error("--db is required for --sql")
+        pairs = (
+            read_csv_pairs(args.csv, args.from_column, args.to_column, args.delimiter) if args.csv else read_sql_pairs(args.db, args.sql)
+        )
+        build_array_mapping_table(
+            args.output, args.from_idtype, args.to_idtype, pairs, integer_ids=args.integer_ids, reversible=args.reversible
+        )
+
+    return lambda args: lambda: execute(args)
@@ -0,0 +1,59 @@
+import logging
+import threading
+from typing import Any
+
+from cachetools import LRUCache, TTLCache
+
+_log = logging.getLogger(__name__)
+
+MISSING = object()
+"""Sentinel returned by `MappingCache.get_many` for ids which are not cached."""
+
+
+class MappingCache:
+    """
+    Bounded and thread-safe cache of mapping results, keyed by (from_idtype, to_idtype, id).
+    Entries are evicted in least-recently-used order once `maxsize` is reached, and expire after `ttl` seconds (if given).
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: LRUCache = TTLCache(maxsize=maxsize, ttl=ttl) if ttl else LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, from_idtype: str, to_idtype: str, ids: list) -> list:
+        """
+        Returns the cached result for every id as a new list, or `MISSING` if it is not cached.
+        """
+        with self._lock:
+            results = [self._cache.get((from_idtype, to_idtype, id), MISSING) for id in ids]
+            misses = sum(1 for r in results if r is MISSING)
+            self.misses += misses
+            self.hits += len(results) - misses
+        # Results are stored as tuples, such that callers modifying their lists cannot change the cached entries
+        return [r if r is MISSING else list(r) for r in results]
+
+    def set_many(self, from_idtype: str, to_idtype: str, ids: list, results: list):
+        with self._lock:
+            for id, result in zip(ids, results, strict=True):
+                if result is not None:
+                    self._cache[(from_idtype, to_idtype, id)] = tuple(result)
+
+    def invalidate(self, from_idtype: str | None = None, to_idtype: str | None = None):
+        """
+        Removes all cached entries of the given edge. Omitting `from_idtype` or `to_idtype` matches every idtype.
+        """
+        with self._lock:
+            if from_idtype is None and to_idtype is None:
+                self._cache.clear()
+                return
+            for key in list(self._cache.keys()):
+                if (from_idtype is None or key[0] == from_idtype) and (to_idtype is None or key[1] == to_idtype):
+                    self._cache.pop(key, None)
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize, "ttl": self.ttl}
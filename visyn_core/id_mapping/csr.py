@@ -0,0 +1,115 @@
+from itertools import accumulate, chain
+
+
+def unique_with_indices(ids) -> tuple[list, list[int]]:
+    """
+    Deduplicates the given ids while preserving their order.
+    For example, [a, b, a, c] becomes ([a, b, c], [0, 1, 0, 2])
+    :return: Tuple of the distinct ids and the index of every incoming id in the distinct ids
+    """
+    positions: dict = {}
+    indices = [positions.setdefault(id, len(positions)) for id in ids]
+    return list(positions), indices
+
+
+def result_lengths(result: list):
+    """
+    Returns the number of ids of every result, where unmapped results may be None.
+    """
+    # Mapping len directly is considerably faster, and most mappers return empty lists instead of None
+    return map(len, result) if None not in result else (len(r) if r else 0 for r in result)
+
+
+def count_ids(result: list) -> int:
+    """
+    Returns the total number of ids of all results, where unmapped results may be None.
+    """
+    return sum(map(len, filter(None, result)))
+
+
+def merge_indexed_arrays(source, offsets, indices) -> list:
+    """
+    Merges the arrays source[indices[j]] for all j in [offsets[k], offsets[k + 1]) into the k-th result array.
+    For example, [[1], [2]] with offsets [0, 2, 3] and indices [1, 0, 1] becomes [[2, 1], [2]]
+    :return: Merged arrays
+    """
+    result = []
+    for k in range(len(offsets) - 1):
+        start = offsets[k]
+        end = offsets[k + 1]
+        if end - start == 1:
+            result.append(source[indices[start]])
+        else:
+            result.append(list(chain.from_iterable(source[indices[j]] for j in range(start, end))))
+    return result
+
+
+def merge_sliced_arrays(source, offsets) -> list:
+    """
+    Merges the arrays source[offsets[k]:offsets[k + 1]] into the k-th result array.
+    For example, [[1], [2], [3]] with offsets [0, 2, 3] becomes [[1, 2], [3]]
+    :return: Merged arrays
+    """
+    result = []
+    for k in range(len(offsets) - 1):
+        start = offsets[k]
+        end = offsets[k + 1]
+        if end - start == 1:
+            result.append(source[start])
+        else:
+            result.append(list(chain.from_iterable(source[start:end])))
+    return result
+
+
+class CSRMapping:
+    """
+    Intermediate result of a mapping path in compressed sparse row form: the distinct ids reached so far are stored once in `values`,
+    and the ids reached from the k-th row (i.e. distinct incoming id) are `values[indices[j]]` for all j in [offsets[k], offsets[k + 1]).
+    Applying a hop only gathers and concatenates slices of the flat offsets and indices, and nested lists are only built for the targets.
+    Offsets and indices are plain lists, as indexing an `array` boxes every integer and is slower in the gather loops.
+    """
+
+    __slots__ = ("identity", "indices", "offsets", "values")
+
+    def __init__(self, values: list, offsets: list[int], indices: list[int], identity: bool = False):
+        self.values = values
+        self.offsets = offsets
+        self.indices = indices
+        # True if every row maps to the value of the same index, i.e. before the first hop
+        self.identity = identity
+
+    @classmethod
+    def from_ids(cls, ids: list) -> "CSRMapping":
+        """
+        Creates the mapping of the distinct incoming ids to themselves.
+        """
+        return cls(ids, list(range(len(ids) + 1)), list(range(len(ids))), identity=True)
+
+    def regroup(self, result: list) -> list:
+        """
+        Regroups the result of a hop, i.e. one list of ids per value, into one list of ids per row.
+        """
+        if self.identity:
+            return result
+        return merge_indexed_arrays(result, self.offsets, self.indices)
+
+    def then(self, result: list) -> "CSRMapping":
+        """
+        Applies the result of a hop, i.e. one list of ids per value, returning the mapping of the rows to the distinct resulting ids.
+        """
+        # The results of all values as one flat array of distinct ids, where the ids of the j-th value are [hop_offsets[j], hop_offsets[j + 1])
+        lengths = list(result_lengths(result))
+        hop_offsets = [0, *accumulate(lengths)]
+        values, hop_indices = unique_with_indices(chain.from_iterable(filter(None, result)))
+        if self.identity:
+            return CSRMapping(values, hop_offsets, hop_indices)
+
+        if lengths.count(1) == len(lengths):
+            # Every value is mapped to exactly one id, i.e. the rows keep their offsets
+            return CSRMapping(values, self.offsets, [hop_indices[j] for j in self.indices])
+
+        # Otherwise, the ids of a row are the concatenated ids of its values, i.e. its offsets are the summed lengths of its values
+        ends = [0, *accumulate(lengths[j] for j in self.indices)]
+        offsets = [ends[offset] for offset in self.offsets]
+        indices = list(chain.from_iterable(hop_indices[hop_offsets[j] : hop_offsets[j + 1]] for j in self.indices))
+        return CSRMapping(values, offsets, indices)
@@ -0,0 +1,117 @@
+import logging
+import re
+import uuid
+from itertools import islice
+
+import sqlalchemy
+from sqlalchemy.engine import Connection, Engine
+
+from .. import manager
+from ..dbview import DBMapping
+from ..settings.model import IdMappingSettings
+
+_log = logging.getLogger(__name__)
+
+_IN_IDS = re.compile(r"\bin\s+:ids\b", re.IGNORECASE)
+_IDS = re.compile(r":ids\b")
+
+
+def _chunks(ids: list, size: int):
+    it = iter(ids)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _to_integer(id) -> int | None:
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return None
+
+
+class DBMappingTable:
+    """
+    Mapper executing the query of a `DBMapping`, i.e. `select from_id as f, to_id as t from mapping_table where from_id in :ids`.
+    Small inputs are bound as `IN` lists of at most `db_chunk_size` ids. Larger inputs are bound as a single array via `= ANY(:ids)`
+    on PostgreSQL, and are otherwise inserted into a temporary table of the connection once they exceed `db_temp_table_threshold`.
+    All queries of a call share one connection checked out from the pool of the engine.
+    """
+
+    preserves_order = True
+
+    def __init__(self, engine: Engine, mapping: DBMapping, settings: IdMappingSettings | None = None):
+        self.from_idtype = mapping.from_idtype
+        self.to_idtype = mapping.to_idtype
+        self.engine = engine
+        self.integer_ids = mapping.integer_ids
+        self.settings = settings or IdMappingSettings()
+        self._in_query = sqlalchemy.text(mapping.query).bindparams(sqlalchemy.bindparam("ids", expanding=True))
+        self._raw_query = mapping.query
+        # Only queries of the documented form `... in :ids` can be rewritten to bind an array
+        self._any_query = (
+            sqlalchemy.text(_IN_IDS.sub("= ANY(:ids)", mapping.query))
+            if engine.dialect.name == "postgresql" and _IN_IDS.search(mapping.query)
+            else None
+        )
+
+    def __call__(self, ids: list, first_only: bool = False) -> list[list]:
+        """
+        Maps the ids, returning only the first mapped id of every id with `first_only`, i.e. the remaining rows of an id are skipped.
+        """
+        if not ids:
+            return []
+        # Ids of an integer mapping which are no integers are not found
+        keys = [_to_integer(id) for id in ids] if self.integer_ids else ids
+        # Query every id only once, as the ids of a request often contain duplicates
+        unique_keys = [key for key in dict.fromkeys(keys) if key is not None]
+
+        grouped: dict = {}
+        if unique_keys:
+            with self.engine.connect() as conn:
+                for from_id, to_id in self.__query(conn, unique_keys):
+                    targets = grouped.setdefault(from_id, [])
+                    if not first_only or not targets:
+                        targets.append(to_id)
+        return [grouped.get(key, []) if key is not None else [] for key in keys]
+
+    def __query(self, conn: Connection, keys: list):
+        if len(keys) <= self.settings.db_chunk_size:
+            yield from conn.execute(self._in_query, {"ids": keys})
+        elif self._any_query is not None:
+            yield from conn.execute(self._any_query, {"ids": keys})
+        elif len(keys) > self.settings.db_temp_table_threshold:
+            yield from self.__query_temp_table(conn, keys)
+        else:
+            for chunk in _chunks(keys, self.settings.db_chunk_size):
+                yield from conn.execute(self._in_query, {"ids": chunk})
+
+    def __query_temp_table(self, conn: Connection, keys: list):
+        table = sqlalchemy.Table(
+            f"visyn_mapping_ids_{uuid.uuid4().hex}",
+            sqlalchemy.MetaData(),
+            sqlalchemy.Column("id", sqlalchemy.BigInteger if self.integer_ids else sqlalchemy.Text, primary_key=True),
+            prefixes=["TEMPORARY"],
+        )
+        table.create(conn)
+        try:
+            for chunk in _chunks(keys, self.settings.db_temp_table_threshold):
+                conn.execute(table.insert(), [{"id": key} for key in chunk])
+            query = sqlalchemy.text(_IDS.sub(f"(select id from {table.name})", self._raw_query))
+            # Fetch all rows before the temporary table is dropped
+            yield from conn.execute(query).fetchall()
+        finally:
+            table.drop(conn)
+
+
+def create_db_mapping_provider():
+    """
+    Creates a `DBMappingTable` for every `DBMapping` of the registered database connectors, used by the 'mapping_provider' extension point.
+    Only enabled via the `db_mappings` setting, as plugins may already register their own providers for these mappings.
+    """
+    settings = manager.settings.visyn_core.id_mapping
+    if not settings.db_mappings:
+        return
+    for connector_id, connector in manager.db.connectors.items():
+        for mapping in connector.mappings or []:
+            _log.info(f"Registering database mapping {mapping.from_idtype} -> {mapping.to_idtype} of {connector_id}")
+            yield mapping.from_idtype, mapping.to_idtype, DBMappingTable(manager.db.engine(connector_id), mapping, settings)
@@ -0,0 +1,205 @@
+import heapq
+import logging
+import threading
+from collections import deque
+from collections.abc import Iterator, Mapping
+from itertools import count
+
+_log = logging.getLogger(__name__)
+
+
+class MappingGraph:
+    """
+    Directed graph of idtypes, with an edge for every available id-2-id mapping.
+    Every edge has a weight (1 by default), and routes are computed lazily once per source idtype and memoized until the graph changes.
+    If all weights are 1, a breadth-first search finds the routes with the fewest hops, otherwise Dijkstra finds the cheapest ones.
+
+    Edges can be added and removed while routes are computed concurrently: adjacency lists are replaced instead of modified,
+    and only the memoized routes which may be affected by a change are discarded.
+    """
+
+    def __init__(self):
+        self._adjacency: dict[str, list[str]] = {}
+        self._nodes: dict[str, None] = {}
+        self._weights: dict[tuple[str, str], float] = {}
+        # Number of edges with a weight other than 1, as the cheaper breadth-first search can be used if there are none
+        self._non_unit_weights = 0
+        self._routes: dict[str, dict[str, list[str]]] = {}
+        self._costs: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+        # Incremented on every change, such that routes computed concurrently to a change are not memoized
+        self._version = 0
+
+    def add_edge(self, from_idtype: str, to_idtype: str, weight: float = 1.0):
+        """
+        Adds the edge or updates its weight, discarding the memoized routes of all sources reaching `from_idtype`.
+        """
+        with self._lock:
+            targets = self._adjacency.get(from_idtype, [])
+            if to_idtype not in targets:
+                self._adjacency[from_idtype] = [*targets, to_idtype]
+            self._nodes[from_idtype] = None
+            self._nodes[to_idtype] = None
+            self.__set_weight((from_idtype, to_idtype), weight)
+            self.__discard_routes(lambda source, routes: source == from_idtype or from_idtype in routes)
+
+    def remove_edge(self, from_idtype: str, to_idtype: str):
+        """
+        Removes the edge, discarding the memoized routes of all sources whose routes use it. Idtypes without edges are removed as well.
+        """
+        with self._lock:
+            targets = self._adjacency.get(from_idtype, [])
+            if to_idtype not in targets:
+                return
+            remaining = [target for target in targets if target != to_idtype]
+            if remaining:
+                self._adjacency[from_idtype] = remaining
+            else:
+                del self._adjacency[from_idtype]
+            self.__set_weight((from_idtype, to_idtype), 1.0)
+            del self._weights[(from_idtype, to_idtype)]
+            for idtype in (from_idtype, to_idtype):
+                if idtype not in self._adjacency and not any(idtype in targets for targets in self._adjacency.values()):
+                    del self._nodes[idtype]
+            # The cheapest routes from a source form a tree, i.e. the edge is used if it leads to the parent of `to_idtype`
+            self.__discard_routes(lambda source, routes: routes.get(to_idtype, [])[-2:-1] == [from_idtype])
+
+    def set_weights(self, weights: dict[tuple[str, str], float]):
+        """
+        Updates the weights of the given (from_idtype, to_idtype) edges, discarding all memoized routes.
+        """
+        with self._lock:
+            for edge, weight in weights.items():
+                self.__set_weight(edge, weight)
+            self._version += 1
+            self._routes = {}
+            self._costs = {}
+
+    def __set_weight(self, edge: tuple[str, str], weight: float):
+        self._non_unit_weights += (weight != 1.0) - (self._weights.get(edge, 1.0) != 1.0)
+        self._weights[edge] = weight
+
+    def __discard_routes(self, affected):
+        self._version += 1
+        for source, routes in list(self._routes.items()):
+            if affected(source, routes):
+                del self._routes[source]
+                self._costs.pop(source, None)
+
+    def nodes(self) -> set[str]:
+        return set(self._nodes)
+
+    def __contains__(self, idtype) -> bool:
+        return idtype in self._nodes
+
+    def neighbours(self, idtype: str) -> list[str]:
+        return self._adjacency.get(idtype, [])
+
+    def routes_from(self, source: str) -> dict[str, list[str]]:
+        """
+        Returns the cheapest route from the source to every reachable idtype, keyed by target idtype.
+        Among routes of equal cost, the one with the fewest hops following the registration order of the edges is chosen.
+        """
+        routes = self._routes.get(source)
+        if routes is None:
+            version = self._version
+            routes, costs = self.__dijkstra(source) if self._non_unit_weights else self.__bfs(source)
+            with self._lock:
+                if version == self._version:
+                    self._routes[source] = routes
+                    self._costs[source] = costs
+        return routes
+
+    def route(self, source: str, target: str) -> list[str] | None:
+        return self.routes_from(source).get(target)
+
+    def route_cost(self, source: str, target: str) -> float | None:
+        """
+        Returns the summed weight of the edges of the route from the source to the target.
+        """
+        routes = self.routes_from(source)
+        costs = self._costs.get(source)
+        if costs is None:
+            # The routes were changed concurrently and not memoized, sum the weights of the route instead
+            route = routes.get(target)
+            return sum(self.weight(a, b) for a, b in zip(route, route[1:])) if route else None
+        return costs.get(target)
+
+    def weight(self, from_idtype: str, to_idtype: str) -> float:
+        return self._weights.get((from_idtype, to_idtype), 1.0)
+
+    def __bfs(self, source: str) -> tuple[dict[str, list[str]], dict[str, float]]:
+        if source not in self._adjacency:
+            return {}, {}
+        parents: dict[str, str] = {source: source}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for neighbour in self._adjacency.get(node, []):
+                if neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append(neighbour)
+
+        routes: dict[str, list[str]] = {}
+        for target in parents:
+            if target == source:
+                continue
+            # Reuse the already reconstructed route of the parent, which is always discovered before its children
+            parent = parents[target]
+            routes[target] = [*routes[parent], target] if parent != source else [source, target]
+        return routes, {target: float(len(route) - 1) for target, route in routes.items()}
+
+    def __dijkstra(self, source: str) -> tuple[dict[str, list[str]], dict[str, float]]:
+        if source not in self._adjacency:
+            return {}, {}
+        # The discovery counter breaks ties in registration order, which equals a breadth-first search for uniform weights
+        counter = count()
+        costs: dict[str, float] = {source: 0.0}
+        hops: dict[str, int] = {source: 0}
+        parents: dict[str, str] = {}
+        # Nodes in the order their cheapest route is final, i.e. every parent is visited before its children
+        visited: dict[str, None] = {}
+        queue = [(0.0, 0, next(counter), source)]
+        while queue:
+            cost, hop, _, node = heapq.heappop(queue)
+            if node in visited:
+                continue
+            visited[node] = None
+            for neighbour in self._adjacency.get(node, []):
+                if neighbour in visited:
+                    continue
+                neighbour_cost = cost + self._weights.get((node, neighbour), 1.0)
+                if neighbour not in costs or (neighbour_cost, hop + 1) < (costs[neighbour], hops[neighbour]):
+                    costs[neighbour] = neighbour_cost
+                    hops[neighbour] = hop + 1
+                    parents[neighbour] = node
+                    heapq.heappush(queue, (neighbour_cost, hop + 1, next(counter), neighbour))
+
+        routes: dict[str, list[str]] = {source: [source]}
+        for target in visited:
+            if target != source:
+                routes[target] = [*routes[parents[target]], target]
+        del routes[source]
+        del costs[source]
+        return routes, costs
+
+
+class MappingPaths(Mapping):
+    """
+    Read-only view of the routes of a `MappingGraph` in the form `{from_idtype: {to_idtype: [path, ...]}}`.
+    Routes are only computed when a source idtype is accessed for the first time.
+    """
+
+    def __init__(self, graph: MappingGraph):
+        self._graph = graph
+
+    def __getitem__(self, from_idtype: str) -> dict[str, list[list[str]]]:
+        if from_idtype not in self._graph:
+            raise KeyError(from_idtype)
+        return {to_idtype: [path] for to_idtype, path in self._graph.routes_from(from_idtype).items()}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._graph.nodes())
+
+    def __len__(self) -> int:
+        return len(self._graph.nodes())
@@ -1,8 +1,10 @@
+import json
 import logging
 from typing import Literal
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from .. import manager
 
@@ -11,6 +13,10 @@ idtype_router = APIRouter(prefix="/api/idtype", tags=["idtype"])
 _log = logging.getLogger(__name__)
 
 
+def to_first(mapped_list: list) -> list:
+    return [None if a is None or len(a) == 0 else a[0] for a in mapped_list]
+
+
 def to_plural(s):
     if s[len(s) - 1] == "y":
         return s[0 : len(s) - 1] + "ies"
@@ -28,6 +34,14 @@ class IdTypeMappingRequest(BaseModel):
     mode: Literal["all", "first"] = "all"
 
 
+class IdTypeMultiMappingRequest(IdTypeMappingRequest):
+    to: list[str]
+
+
+class IdTypeMappingStreamRequest(IdTypeMappingRequest):
+    chunk_size: int = Field(10_000, gt=0)
+
+
 class IdTypeMappingSearchRequest(BaseModel):
     q: str
     limit: int | None = 10
@@ -38,8 +52,34 @@ class IdTypeMappingSearchResponse(BaseModel):
     to: str
 
 
+class IdTypeMappingJob(BaseModel):
+    id: str
+    state: str
+    done: int | None = None
+    total: int | None = None
+    error: str | None = None
+
+
+class IdTypeMappingEdge(BaseModel):
+    from_idtype: str
+    to_idtype: str
+    cost: float
+    static_cost: float
+    calls: int
+    mean_duration: float | None
+    hit_rate: float | None
+
+
+class IdTypeMappingRoute(BaseModel):
+    from_idtype: str
+    to_idtype: str
+    path: list[str]
+    cost: float
+    edges: list[IdTypeMappingEdge]
+
+
 @idtype_router.get("/", response_model=list[IdType])
-def list_idtypes():
+async def list_idtypes():
     # TODO: We probably don't want to have these idtypes as "all" idtypes
     # for d in list_datasets():
     #     for idtype in d.to_idtype_descriptions():
@@ -49,31 +89,148 @@ def list_idtypes():
     return [IdType(id=idtype_id, name=idtype_id, names=to_plural(idtype_id)) for idtype_id in manager.id_mapping.known_idtypes()]
 
 
-@idtype_router.get("/{idtype}/", response_model=list[IdType])
-def maps_to(idtype: str):
+# Prefixed with an underscore, such that it does not shadow the mappings of an idtype named "routes"
+@idtype_router.get("/_routes/", response_model=list[IdTypeMappingRoute])
+async def mapping_routes(idtype: str | None = None, to_idtype: str | None = None):
+    """
+    Lists the route chosen for every pair of idtypes (optionally only from `idtype` or to `to_idtype`), along with its cost
+    and the observed latency and hit rate of every edge.
+    """
+    routes = []
+    for from_idtype in [idtype] if idtype else sorted(manager.id_mapping.known_idtypes()):
+        for target_idtype in [to_idtype] if to_idtype else sorted(manager.id_mapping.maps_to(from_idtype)):
+            route = manager.id_mapping.route_info(from_idtype, target_idtype)
+            if route:
+                routes.append(route)
+    return routes
+
+
+def get_mapping_job(job_id: str):
+    if manager.celery is None:
+        raise HTTPException(status_code=503, detail="Celery is not configured")
+    from celery.result import AsyncResult
+
+    return AsyncResult(job_id, app=manager.celery)
+
+
+# The job endpoints are sync, as Celery blocks while it talks to the broker and result backend, such that FastAPI runs them in the threadpool.
+# They are prefixed with an underscore, such that they do not shadow the mappings of an idtype named "jobs".
+@idtype_router.get("/_jobs/{job_id}/", response_model=IdTypeMappingJob)
+def mapping_job(job_id: str):
+    """
+    Returns the state of a mapping job, and the number of mapped ids while it is running.
+    """
+    result = get_mapping_job(job_id)
+    job = IdTypeMappingJob(id=job_id, state=result.state)
+    if job.state in ("PROGRESS", "SUCCESS") and isinstance(result.info, dict):
+        # Both the progress and the result of `map_ids` only contain the counts, not the mapped ids
+        job.done = result.info.get("done")
+        job.total = result.info.get("total")
+    elif result.failed():
+        job.error = str(result.info)
+    return job
+
+
+@idtype_router.get("/_jobs/{job_id}/result/", response_class=StreamingResponse)
+def mapping_job_result(job_id: str):
+    """
+    Downloads the result of a finished mapping job as a file with one JSON line per id, in the order of the submitted ids.
+    """
+    from .tasks import load_mapped_ids
+
+    result = get_mapping_job(job_id)
+    if not result.successful():
+        raise HTTPException(status_code=409, detail=f"Mapping job {job_id} is not finished successfully, but {result.state}")
+
+    mapped_list = load_mapped_ids(result)
+    if mapped_list is None:
+        raise HTTPException(status_code=410, detail=f"The result of mapping job {job_id} expired")
+
+    def generate_rows():
+        chunk_size = 10_000
+        for start in range(0, len(mapped_list), chunk_size):
+            yield "".join(f"{json.dumps(row)}\n" for row in mapped_list[start : start + chunk_size])
+
+    return StreamingResponse(
+        generate_rows(), media_type="application/x-ndjson", headers={"Content-Disposition": f'attachment; filename="{job_id}.ndjson"'}
+    )
+
+
+@idtype_router.get("/{idtype}/", response_model=list[str])
+async def maps_to(idtype: str):
     return manager.id_mapping.maps_to(idtype)
 
 
-@idtype_router.get("/{idtype}/{to_idtype}/", response_model=list[str])
-@idtype_router.post("/{idtype}/{to_idtype}/", response_model=list[str])
-def mapping_to(body: IdTypeMappingRequest, idtype: str, to_idtype: str):
+# Depending on the mode, either all mapped ids or only the first one is returned per id
+IdTypeMappingResponse = list[list[str] | None] | list[str | None]
+
+
+@idtype_router.post("/{idtype}/", response_model=dict[str, IdTypeMappingResponse])
+async def mapping_to_many(body: IdTypeMultiMappingRequest, idtype: str):
+    """
+    Maps `q` to all idtypes of `to` at once, returning the mapped ids per target idtype.
+    Hops shared by the paths to multiple targets are only resolved once.
+    """
+    first_only = body.mode == "first"
+    mapped = await manager.id_mapping.amap_many(idtype, body.to, body.q, first_only=first_only)
+    if first_only:
+        mapped = {to_idtype: to_first(mapped_list) for to_idtype, mapped_list in mapped.items()}
+    return mapped
+
+
+@idtype_router.get("/{idtype}/{to_idtype}/", response_model=IdTypeMappingResponse)
+@idtype_router.post("/{idtype}/{to_idtype}/", response_model=IdTypeMappingResponse)
+async def mapping_to(body: IdTypeMappingRequest, idtype: str, to_idtype: str):
     first_only = body.mode == "first"
 
     names = body.q
-    mapped_list = manager.id_mapping(idtype, to_idtype, names)
+    # Async mappers are awaited on the event loop, sync ones are run in worker threads
+    mapped_list = await manager.id_mapping.amap(idtype, to_idtype, names, first_only=first_only)
 
     if first_only:
-        mapped_list = [None if a is None or len(a) == 0 else a[0] for a in mapped_list]
+        mapped_list = to_first(mapped_list)
 
     return mapped_list
 
 
+@idtype_router.post("/{idtype}/{to_idtype}/stream/", response_class=StreamingResponse)
+async def mapping_to_stream(body: IdTypeMappingStreamRequest, idtype: str, to_idtype: str):
+    """
+    Streaming version of the mapping for large requests: `q` is mapped in chunks of `chunk_size` ids,
+    and the result of every id is written as soon as its chunk is mapped, as one JSON line per id in the order of `q`.
+    """
+    first_only = body.mode == "first"
+
+    async def generate_rows():
+        async for mapped_list in manager.id_mapping.amap_chunks(idtype, to_idtype, body.q, body.chunk_size, first_only=first_only):
+            if first_only:
+                mapped_list = to_first(mapped_list)
+            yield "".join(f"{json.dumps(row)}\n" for row in mapped_list)
+
+    return StreamingResponse(generate_rows(), media_type="application/x-ndjson")
+
+
+@idtype_router.post("/{idtype}/{to_idtype}/jobs/", response_model=IdTypeMappingJob, status_code=202)
+def mapping_to_job(body: IdTypeMappingStreamRequest, idtype: str, to_idtype: str):
+    """
+    Submits a Celery job mapping `q` in chunks of `chunk_size` ids, i.e. for millions of ids.
+    The state of the job is polled via `/_jobs/{id}/`, and the result is downloaded via `/_jobs/{id}/result/`.
+    """
+    if manager.celery is None:
+        raise HTTPException(status_code=503, detail="Celery is not configured")
+    from .tasks import map_ids
+
+    # Use the task bound to the configured app, as the current Celery app is thread-local
+    result = manager.celery.tasks[map_ids.name].apply_async(args=(idtype, to_idtype, body.q, body.mode == "first", body.chunk_size))
+    return IdTypeMappingJob(id=result.id, state=result.state, total=len(body.q))
+
+
 @idtype_router.get("/{idtype}/{to_idtype}/search/", response_model=list[IdTypeMappingSearchResponse])
-def mapping_to_search(body: IdTypeMappingSearchRequest, idtype, to_idtype):
+async def mapping_to_search(body: IdTypeMappingSearchRequest, idtype, to_idtype):
     query = body.q
     max_results = body.limit
-    if hasattr(manager.id_mapping, "search"):
-        return manager.id_mapping.search(idtype, to_idtype, query, max_results)
+    if hasattr(manager.id_mapping, "asearch"):
+        return await manager.id_mapping.asearch(idtype, to_idtype, query, max_results)
     return []
 
 
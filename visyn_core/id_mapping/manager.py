@@ -1,8 +1,31 @@
+import asyncio
+import inspect
 import logging
+import threading
+import time
 from builtins import set
-from itertools import chain
+from collections.abc import AsyncIterator, Generator, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import accumulate, chain, count
+
+import anyio.to_thread
 
 from .. import manager
+from ..settings.model import IdMappingSettings
+from .cache import MISSING, MappingCache
+from .csr import (
+    CSRMapping,
+    merge_indexed_arrays,
+    merge_sliced_arrays,
+    unique_with_indices,
+)
+from .graph import MappingGraph, MappingPaths
+from .materialized import MaterializedMapping
+from .reverse import ReverseMappingTable
+from .search import top_search_results
+from .stats import MappingStats
+from .telemetry import MappingTelemetry
 
 _log = logging.getLogger(__name__)
 
@@ -10,13 +33,30 @@ _log = logging.getLogger(__name__)
 class MappingManager:
     """
     Mapping manager creating a graph of all available id-2-id mappings, allowing for transitive id-mappings.
-    This graph is traversed via shortest path when mapping from one id-(type) to another.
+    This graph is traversed via the cheapest path when mapping from one id-(type) to another, which is computed once per source id-(type) on first use.
+    Mappers can declare their expected latency per call via `cost` (see `default_cost`), otherwise the path with the fewest hops is chosen.
+    With `adaptive_routing`, the observed latency of every edge is used instead once it has been observed.
+
+    A mapper is a callable `mapper(ids) -> list[list[id]]`. If it sets `preserves_order = True`, it is called once with all ids
+    and has to return the results in the order of the incoming ids. Otherwise, it can implement `map_grouped(ids) -> dict[id, list[id]]`
+    to be called once with all ids, returning the results keyed by the incoming id. Mappers supporting neither are called once per id.
+    For type-ahead search, mappers either implement `search(query, max_results)` or expose a populated `SearchIndex` as `search_index`.
+    Both `__call__`/`map_grouped` and `search` may be coroutine functions, which are awaited natively by `amap` and `asearch`.
+    If `__call__`/`map_grouped` accept a `first_only` keyword, it is set when only the first mapped id of every id is requested,
+    such that the mapper may skip the remaining ones.
+    Mappers setting `reversible = True` and exposing their table via `items()` also provide the reverse edge via a lazily built inverted index,
+    unless a reverse provider is registered explicitly (see `ReverseMappingTable`).
     """
 
-    def __init__(self, providers):
+    def __init__(self, providers, settings: IdMappingSettings | None = None, telemetry: MappingTelemetry | None = None):
+        self.settings = settings or IdMappingSettings()
+        # Spans and histograms of every hop and mapper call, using the global OpenTelemetry providers by default
+        self.telemetry = telemetry or MappingTelemetry()
         self.mappers = {}
-        self.paths = {}
-        graph = {}
+        self.graph = MappingGraph()
+        # Reverse edges derived from reversible forward mappers, as (from_idtype, to_idtype, forward mapper, reverse mapper) of the forward edge
+        self._reverse: list[tuple[str, str, object, ReverseMappingTable]] = []
+        providers = list(providers)
         for from_idtype, to_idtype, mapper in providers:
             # generate mapper mapping
             from_mappings = self.mappers.get(from_idtype, {})
@@ -25,76 +65,419 @@ class MappingManager:
             from_mappings[to_idtype] = to_mappings
             to_mappings.append(mapper)
             # generate type graph
-            from_graph = graph.get(from_idtype, [])
-            from_graph.append(to_idtype)
-            graph[from_idtype] = from_graph
-        # generate path map
-        entries = self.known_idtypes()
-        for _from in entries:
-            # calculate all paths
-            all_paths = {_to: self.__find_all_paths(graph, _from, _to) for _to in entries if _to != _from}
-            # remove missing paths
-            for key, value in list(all_paths.items()):
-                if not value:
-                    del all_paths[key]
-            self.paths[_from] = all_paths
+            self.graph.add_edge(from_idtype, to_idtype)
+        # Derive the reverse edges only once all providers are known, as hand-written reverse providers take precedence
+        for from_idtype, to_idtype, mapper in providers:
+            if self.__derive_reverse(from_idtype, to_idtype, mapper):
+                self.graph.add_edge(to_idtype, from_idtype)
+        # Weight the edges by the static cost declared by their mappers
+        self.graph.set_weights(
+            {
+                edge: self.static_cost(*edge)
+                for edge in chain(
+                    ((from_idtype, to_idtype) for from_idtype, to_idtype, _ in providers),
+                    ((to_idtype, from_idtype) for from_idtype, to_idtype, _, _ in self._reverse),
+                )
+            }
+        )
+        # Paths are computed lazily per source idtype when they are first requested
+        self.paths = MappingPaths(self.graph)
+        self.stats = MappingStats()
+        # Precomputed lookup tables of (from_idtype, to_idtype) pairs, see `materialize`
+        self._materialized: dict[tuple[str, str], MaterializedMapping] = {}
+        self._materialize_lock = threading.Lock()
+        # Edges invalidated while a table is built, per running build
+        self._materialize_builds: dict[int, list[tuple[str | None, str | None]]] = {}
+        self._materialize_build_ids = count()
+        self._weights_refreshed_at = time.monotonic()
+        cache_settings = self.settings.cache
+        self.cache = MappingCache(cache_settings.maxsize, cache_settings.ttl) if cache_settings.enabled else None
+        # Thread pool to run multiple mappers of the same edge concurrently, created on first use
+        self._executor: ThreadPoolExecutor | None = None
+        # Calls still running after their `provider_timeout`, by the id of their mapper
+        self._timed_out: dict[int, Future] = {}
+        self._providers_lock = threading.Lock()
+
+    def add_provider(self, from_idtype: str, to_idtype: str, mapper):
+        """
+        Registers a mapper at runtime, i.e. for a dataset-specific mapping. Only the memoized routes which may change are discarded,
+        and the cached results of the edge are invalidated. In-flight mappings continue with the mappers they started with.
+        """
+        with self._providers_lock:
+            from_mappings = self.mappers.setdefault(from_idtype, {})
+            # A hand-written provider replaces the reverse mappers derived for the same edge
+            derived = [
+                reverse for forward_from, forward_to, _, reverse in self._reverse if (forward_to, forward_from) == (from_idtype, to_idtype)
+            ]
+            if derived:
+                self._reverse = [entry for entry in self._reverse if entry[3] not in derived]
+            # Replace the list instead of appending to it, such that in-flight mappings iterating it are not affected
+            from_mappings[to_idtype] = [*(m for m in from_mappings.get(to_idtype, []) if m not in derived), mapper]
+            self.graph.add_edge(from_idtype, to_idtype, self.edge_cost(from_idtype, to_idtype))
+            if self.__derive_reverse(from_idtype, to_idtype, mapper):
+                self.graph.add_edge(to_idtype, from_idtype, self.edge_cost(to_idtype, from_idtype))
+        _log.info(f"Added mapping provider from {from_idtype} to {to_idtype}")
+        self.invalidate(from_idtype, to_idtype)
+
+    def remove_provider(self, from_idtype: str, to_idtype: str, mapper) -> bool:
+        """
+        Removes a mapper registered via the constructor or `add_provider`, removing the edge from the graph if it was its last mapper.
+        The reverse edge derived from the mapper on this edge is removed with it, and reversible mappers of the reverse edge are used
+        to derive this edge again once no hand-written mapper is left on it.
+        :return: True if the mapper was registered
+        """
+        with self._providers_lock:
+            if not self.__remove_mapper(from_idtype, to_idtype, mapper):
+                return False
+            reverse_removed = False
+            remaining = []
+            for entry in self._reverse:
+                forward_from, forward_to, forward, reverse = entry
+                if forward is mapper and (forward_from, forward_to) == (from_idtype, to_idtype):
+                    # The reverse edge derived from the mapper on this edge is removed with it
+                    reverse_removed = self.__remove_mapper(to_idtype, from_idtype, reverse) or reverse_removed
+                elif not (reverse is mapper and (forward_to, forward_from) == (from_idtype, to_idtype)):
+                    remaining.append(entry)
+            self._reverse = remaining
+            # Reversible mappers of the reverse edge provide this edge again once no hand-written mapper is left on it
+            for forward in self.mappers.get(to_idtype, {}).get(from_idtype, []):
+                if self.__derive_reverse(to_idtype, from_idtype, forward):
+                    self.graph.add_edge(from_idtype, to_idtype, self.edge_cost(from_idtype, to_idtype))
+        _log.info(f"Removed mapping provider from {from_idtype} to {to_idtype}")
+        self.invalidate(from_idtype, to_idtype)
+        if reverse_removed:
+            self.invalidate(to_idtype, from_idtype)
+        return True
+
+    def __remove_mapper(self, from_idtype: str, to_idtype: str, mapper) -> bool:
+        to_mappings = self.mappers.get(from_idtype, {}).get(to_idtype, [])
+        remaining = [m for m in to_mappings if m is not mapper]
+        if len(remaining) == len(to_mappings):
+            return False
+        if remaining:
+            self.mappers[from_idtype][to_idtype] = remaining
+            self.graph.add_edge(from_idtype, to_idtype, self.edge_cost(from_idtype, to_idtype))
+        else:
+            del self.mappers[from_idtype][to_idtype]
+            if not self.mappers[from_idtype]:
+                del self.mappers[from_idtype]
+            self.graph.remove_edge(from_idtype, to_idtype)
+        return True
+
+    def __derive_reverse(self, from_idtype: str, to_idtype: str, mapper) -> bool:
+        """
+        Registers a `ReverseMappingTable` for the reverse edge of a mapper setting `reversible = True` and exposing its table via `items()`,
+        unless the reverse edge already has other mappers than derived ones.
+        :return: True if the reverse mapper was registered
+        """
+        if not getattr(mapper, "reversible", False) or not hasattr(mapper, "items"):
+            return False
+        if any(
+            forward is mapper and (forward_from, forward_to) == (from_idtype, to_idtype)
+            for forward_from, forward_to, forward, _ in self._reverse
+        ):
+            return False
+        to_mappings = self.mappers.get(to_idtype, {}).get(from_idtype, [])
+        derived = {id(reverse) for _, _, _, reverse in self._reverse}
+        if any(id(m) not in derived for m in to_mappings):
+            return False
+        reverse = ReverseMappingTable(mapper)
+        self.mappers.setdefault(to_idtype, {})[from_idtype] = [*to_mappings, reverse]
+        self._reverse = [*self._reverse, (from_idtype, to_idtype, mapper, reverse)]
+        _log.info(f"Derived reverse mapping provider from {to_idtype} to {from_idtype}")
+        return True
 
     def known_idtypes(self):
         """
         returns a set of a all known id types in this mapping graph
         :return:
         """
-        s = set()
-        for from_, v in self.mappers.items():
-            s.add(from_)
-            for to_ in list(v.keys()):
-                s.add(to_)
-        return s
+        return self.graph.nodes()
 
-    def __find_all_paths(self, graph, start, end, path=None):
+    def static_cost(self, from_idtype, to_idtype) -> float:
         """
-        Returns all possible paths in the graph from start to end
-        :return: Array of all possible paths (string arrays) sorted by shortest path first
+        Returns the cost of an edge as declared by its mappers via `cost`, defaulting to `default_cost` if they do not declare one.
         """
-        if path is None:
-            path = []
-        path = [*path, start]
-        if start == end:
-            return [path]
-        if start not in graph:
-            return []
-        paths = []
-        for node in graph[start]:
-            if node not in path:
-                newpaths = self.__find_all_paths(graph, node, end, path)
-                for newpath in newpaths:
-                    paths.append(newpath)
-        return sorted(paths, key=len)
-
-    def __resolve_single(self, from_idtype, to_idtype, ids) -> list:
-        from_mappings = self.mappers.get(from_idtype, {})
-        to_mappings = from_mappings.get(to_idtype, [])
+        costs = [getattr(mapper, "cost", self.settings.default_cost) for mapper in self.mappers.get(from_idtype, {}).get(to_idtype, [])]
+        if not costs:
+            return self.settings.default_cost
+        # Concurrently running mappers take as long as the slowest one, otherwise the sum of all of them
+        return max(costs) if self.settings.parallel_providers else sum(costs)
+
+    def edge_cost(self, from_idtype, to_idtype) -> float:
+        """
+        Returns the expected cost of an edge: the observed mean duration if `adaptive_routing` is enabled and it has been observed often enough,
+        otherwise its static cost.
+        """
+        if self.settings.adaptive_routing:
+            edge_stats = self.stats.get(from_idtype, to_idtype)
+            if edge_stats is not None and edge_stats.calls >= self.settings.adaptive_routing_min_calls:
+                return edge_stats.mean_duration  # type: ignore
+        return self.static_cost(from_idtype, to_idtype)
+
+    def __refresh_weights(self):
+        """
+        Updates the weights of the graph with the observed edge costs, at most once per `adaptive_routing_interval`.
+        """
+        now = time.monotonic()
+        if now - self._weights_refreshed_at < self.settings.adaptive_routing_interval:
+            return
+        self._weights_refreshed_at = now
+        self.graph.set_weights({edge: self.edge_cost(*edge) for edge, _ in self.stats.items()})
+
+    def route_info(self, from_idtype, to_idtype) -> dict | None:
+        """
+        Returns the route chosen to map from `from_idtype` to `to_idtype`, its cost and the observed statistics of every edge.
+        """
+        path = self.graph.route(from_idtype, to_idtype)
+        if not path:
+            return None
+        edges = []
+        for edge_from, edge_to in zip(path, path[1:]):
+            edge_stats = self.stats.get(edge_from, edge_to)
+            edges.append(
+                {
+                    "from_idtype": edge_from,
+                    "to_idtype": edge_to,
+                    "cost": self.graph.weight(edge_from, edge_to),
+                    "static_cost": self.static_cost(edge_from, edge_to),
+                    "calls": edge_stats.calls if edge_stats else 0,
+                    "mean_duration": edge_stats.mean_duration if edge_stats else None,
+                    "hit_rate": edge_stats.hit_rate if edge_stats else None,
+                }
+            )
+        return {
+            "from_idtype": from_idtype,
+            "to_idtype": to_idtype,
+            "path": path,
+            "cost": self.graph.route_cost(from_idtype, to_idtype),
+            "edges": edges,
+        }
+
+    def invalidate(self, from_idtype: str | None = None, to_idtype: str | None = None):
+        """
+        Removes the cached results of the mapping from `from_idtype` to `to_idtype`, i.e. if the data of a provider changed.
+        Omitting `from_idtype` or `to_idtype` invalidates the mappings from or to every idtype.
+        The inverted indices of reverse edges derived from an invalidated edge are dropped and rebuilt on their next use.
+        """
+        self.__invalidate_edge(from_idtype, to_idtype)
+        for forward_from, forward_to, _, reverse in self._reverse:
+            if (from_idtype is None or forward_from == from_idtype) and (to_idtype is None or forward_to == to_idtype):
+                reverse.reset()
+                if from_idtype is not None or to_idtype is not None:
+                    self.__invalidate_edge(forward_to, forward_from)
+
+    def __invalidate_edge(self, from_idtype: str | None, to_idtype: str | None):
+        if self.cache is not None:
+            self.cache.invalidate(from_idtype, to_idtype)
+
+        # Materialized tables built via an invalidated edge are dropped and rebuilt in the background
+        with self._materialize_lock:
+            for invalidated in self._materialize_builds.values():
+                invalidated.append((from_idtype, to_idtype))
+            outdated = [pair for pair, table in self._materialized.items() if table.uses_edge(from_idtype, to_idtype)]
+            for pair in outdated:
+                del self._materialized[pair]
+        if outdated:
+            self.materialize_in_background(outdated)
+
+    def materialize(self, from_idtype: str, to_idtype: str) -> MaterializedMapping | None:
+        """
+        Precomputes the mapping from `from_idtype` to `to_idtype` for all ids of the first hop into a lookup table,
+        which is used instead of traversing the path afterwards. Requires all mappers of the first hop to list their ids via `keys()`.
+        :return: The materialized table, or None if the mapping cannot be materialized
+        """
+        path = self.graph.route(from_idtype, to_idtype)
+        if not path:
+            _log.warning("Cannot materialize mapping from %s to %s without a path", from_idtype, to_idtype)
+            return None
+        first_mappers = self.mappers[path[0]][path[1]]
+        if not all(hasattr(mapper, "keys") for mapper in first_mappers):
+            _log.warning(
+                "Cannot materialize mapping from %s to %s, as not all mappers of %s to %s list their keys",
+                from_idtype,
+                to_idtype,
+                *path[:2],
+            )
+            return None
+
+        for attempt in range(self.settings.materialize_max_attempts):
+            build_id = next(self._materialize_build_ids)
+            with self._materialize_lock:
+                self._materialize_builds[build_id] = []
+                # Drop an outdated table, such that the new one is built from the live mapping
+                self._materialized.pop((from_idtype, to_idtype), None)
+            start = time.perf_counter()
+            try:
+                keys = list(dict.fromkeys(chain.from_iterable(_run_sync(mapper.keys()) for mapper in first_mappers)))
+                results = list(chain.from_iterable(self.map_chunks(from_idtype, to_idtype, keys, self.settings.materialize_chunk_size)))
+            except BaseException:
+                with self._materialize_lock:
+                    self._materialize_builds.pop(build_id, None)
+                raise
+            table = MaterializedMapping(path, keys, results)
+            with self._materialize_lock:
+                # Only store the table if no edge of its path was invalidated while it was built, otherwise build it again
+                outdated = any(table.uses_edge(*edge) for edge in self._materialize_builds.pop(build_id))
+                if not outdated:
+                    self._materialized[(from_idtype, to_idtype)] = table
+            if not outdated:
+                break
+            _log.info(
+                f"Rebuilding the materialized mapping from {from_idtype} to {to_idtype}, as its path was invalidated (attempt {attempt + 1})"
+            )
+        else:
+            _log.warning(
+                "Cannot materialize mapping from %s to %s, as its path was invalidated during %d attempts",
+                from_idtype,
+                to_idtype,
+                self.settings.materialize_max_attempts,
+            )
+            return None
+        _log.info(f"Materialized mapping from {from_idtype} to {to_idtype} with {len(table)} ids in {time.perf_counter() - start:.2f}s")
+        return table
+
+    def materialize_in_background(self, pairs: list[tuple[str, str]] | None = None) -> threading.Thread:
+        """
+        Materializes the given (from_idtype, to_idtype) pairs, or all pairs of the `materialize` setting, in a background thread.
+        """
+        pairs = list(pairs if pairs is not None else self.settings.materialize)
+
+        def run():
+            for from_idtype, to_idtype in pairs:
+                try:
+                    self.materialize(from_idtype, to_idtype)
+                except Exception:
+                    _log.exception(f"Error materializing mapping from {from_idtype} to {to_idtype}")
+
+        t = threading.Thread(target=run, name="id_mapping_materialize", daemon=True)
+        t.start()
+        return t
+
+    def is_materialized(self, from_idtype: str, to_idtype: str) -> bool:
+        return (from_idtype, to_idtype) in self._materialized
+
+    def cache_info(self) -> dict | None:
+        """
+        Returns the hits, misses and size of the result cache, or None if caching is disabled.
+        """
+        return self.cache.info() if self.cache is not None else None
+
+    def __resolve_single(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        if self.cache is None:
+            return self.__resolve_uncached(from_idtype, to_idtype, ids, first_only)
+
+        # Only send the ids to the mappers which are not cached yet
+        cached, missing = self.__lookup_cache(from_idtype, to_idtype, ids)
+        if not missing:
+            return cached
+        resolved = self.__resolve_uncached(from_idtype, to_idtype, missing, first_only)
+        return self.__fill_cache(from_idtype, to_idtype, cached, missing, resolved, first_only)
+
+    async def __aresolve_single(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        if self.cache is None:
+            return await self.__aresolve_uncached(from_idtype, to_idtype, ids, first_only)
+
+        cached, missing = await anyio.to_thread.run_sync(self.__lookup_cache, from_idtype, to_idtype, ids)
+        if not missing:
+            return cached
+        resolved = await self.__aresolve_uncached(from_idtype, to_idtype, missing, first_only)
+        return await anyio.to_thread.run_sync(self.__fill_cache, from_idtype, to_idtype, cached, missing, resolved, first_only)
+
+    def __lookup_cache(self, from_idtype, to_idtype, ids) -> tuple[list, list]:
+        cached = self.cache.get_many(from_idtype, to_idtype, ids)  # type: ignore
+        return cached, [id for id, r in zip(ids, cached, strict=True) if r is MISSING]
+
+    def __fill_cache(self, from_idtype, to_idtype, cached: list, missing: list, resolved: list, first_only: bool) -> list:
+        # With `first_only`, secondary mappers may have been skipped, such that only the results of a single mapper are complete,
+        # unless the mapper truncated them itself
+        to_mappings = self.mappers.get(from_idtype, {}).get(to_idtype, [])
+        if not first_only or (len(to_mappings) <= 1 and not any(map(_accepts_first_only, to_mappings))):
+            self.cache.set_many(from_idtype, to_idtype, missing, resolved)  # type: ignore
+        return _fill_missing(cached, resolved)
+
+    def __find_mappers(self, from_idtype, to_idtype) -> list:
+        to_mappings = self.mappers.get(from_idtype, {}).get(to_idtype, [])
         if not to_mappings:
             _log.warn("cannot find mapping from %s to %s", from_idtype, to_idtype)
-            return [None for _ in ids]
+        return to_mappings
 
-        def apply_mapping(mapper, ids: list[str]):
-            # Each mapper can define if it preserves the order of the incoming ids.
-            if hasattr(mapper, "preserves_order") and mapper.preserves_order:
-                return mapper(ids)
-            else:
-                # If this is not the case, we need to map every single id separately
-                return [mapper([id])[0] for id in ids]
+    def __resolve_uncached(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        with self.telemetry.hop(from_idtype, to_idtype, ids) as span:
+            start = time.perf_counter()
+            result = self.__resolve_mappers(from_idtype, to_idtype, ids, first_only)
+            self.telemetry.end_hop(span, result)
+        self.__record(from_idtype, to_idtype, time.perf_counter() - start, result)
+        return result
+
+    async def __aresolve_uncached(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        with self.telemetry.hop(from_idtype, to_idtype, ids) as span:
+            start = time.perf_counter()
+            result = await self.__aresolve_mappers(from_idtype, to_idtype, ids, first_only)
+            self.telemetry.end_hop(span, result)
+        self.__record(from_idtype, to_idtype, time.perf_counter() - start, result)
+        return result
+
+    def __record(self, from_idtype, to_idtype, duration: float, result: list):
+        self.stats.record(from_idtype, to_idtype, duration, len(result), sum(map(bool, result)))
+
+    def __resolve_mappers(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        to_mappings = self.__find_mappers(from_idtype, to_idtype)
+        if not to_mappings:
+            return [None for _ in ids]
 
         if len(to_mappings) == 1:
             # single mapping no need for merging
-            return apply_mapping(to_mappings[0], ids)
+            return self.__apply_mapping(from_idtype, to_idtype, to_mappings[0], ids, first_only)
+
+        if first_only:
+            # Secondary mappers are only asked for the ids which the previous ones could not map
+            results = [[] for _ in ids]
+            pending = list(range(len(ids)))
+            for mapper in to_mappings:
+                pending = _merge_first_mapped(
+                    results, pending, self.__apply_mapping(from_idtype, to_idtype, mapper, [ids[i] for i in pending], first_only)
+                )
+                if not pending:
+                    break
+            return results
+
+        if self.settings.parallel_providers:
+            mapped_per_mapper = self.__apply_mappings_concurrently(from_idtype, to_idtype, to_mappings, ids)
+        else:
+            mapped_per_mapper = (self.__apply_mapping(from_idtype, to_idtype, mapper, ids) for mapper in to_mappings)
+        return self.__merge_mapper_results(ids, mapped_per_mapper)
+
+    async def __aresolve_mappers(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        to_mappings = self.__find_mappers(from_idtype, to_idtype)
+        if not to_mappings:
+            return [None for _ in ids]
+
+        if len(to_mappings) == 1:
+            return await self.__aapply_mapping(from_idtype, to_idtype, to_mappings[0], ids, first_only)
 
+        if first_only:
+            results = [[] for _ in ids]
+            pending = list(range(len(ids)))
+            for mapper in to_mappings:
+                pending = _merge_first_mapped(
+                    results, pending, await self.__aapply_mapping(from_idtype, to_idtype, mapper, [ids[i] for i in pending], first_only)
+                )
+                if not pending:
+                    break
+            return results
+
+        if self.settings.parallel_providers:
+            mapped_per_mapper = await self.__aapply_mappings_concurrently(from_idtype, to_idtype, to_mappings, ids)
+        else:
+            mapped_per_mapper = [await self.__aapply_mapping(from_idtype, to_idtype, mapper, ids) for mapper in to_mappings]
+        return self.__merge_mapper_results(ids, mapped_per_mapper)
+
+    def __merge_mapper_results(self, ids, mapped_per_mapper) -> list:
         # two way to preserve the order of the results
         r = [[] for _ in ids]
         rset = [set() for _ in ids]
-        for mapper in to_mappings:
-            mapped_ids = apply_mapping(mapper, ids)
+        for mapped_ids in mapped_per_mapper:
             for mapped_id, rlist, rhash in zip(mapped_ids, r, rset, strict=False):
                 for id in mapped_id:
                     if id not in rhash:
@@ -102,6 +485,143 @@ class MappingManager:
                         rhash.add(id)
         return r
 
+    def __apply_mapping(self, from_idtype, to_idtype, mapper, ids: list, first_only=False) -> list:
+        start = time.perf_counter()
+        result = self.__call_mapper(mapper, ids, first_only)
+        self.telemetry.record(from_idtype, to_idtype, mapper, ids, result, time.perf_counter() - start)
+        return result
+
+    async def __aapply_mapping(self, from_idtype, to_idtype, mapper, ids: list, first_only=False) -> list:
+        start = time.perf_counter()
+        result = await self.__acall_mapper(mapper, ids, first_only)
+        self.telemetry.record(from_idtype, to_idtype, mapper, ids, result, time.perf_counter() - start)
+        return result
+
+    def __call_mapper(self, mapper, ids: list, first_only=False) -> list:
+        # Each mapper can define if it preserves the order of the incoming ids.
+        if hasattr(mapper, "preserves_order") and mapper.preserves_order:
+            return _run_sync(mapper(ids, **_first_only_kwargs(mapper, first_only)))
+        elif hasattr(mapper, "map_grouped"):
+            # Otherwise, it can return the results keyed by the incoming id, which we scatter back into the request order
+            grouped = _run_sync(mapper.map_grouped(ids, **_first_only_kwargs(mapper.map_grouped, first_only)))
+            return [grouped.get(id, []) for id in ids]
+        else:
+            # If this is not the case either (i.e. legacy mappers), we need to map every single id separately
+            return [_run_sync(mapper([id]))[0] for id in ids]
+
+    async def __acall_mapper(self, mapper, ids: list, first_only=False) -> list:
+        if hasattr(mapper, "preserves_order") and mapper.preserves_order:
+            if is_async_callable(mapper):
+                return await mapper(ids, **_first_only_kwargs(mapper, first_only))
+        elif hasattr(mapper, "map_grouped"):
+            if is_async_callable(mapper.map_grouped):
+                grouped = await mapper.map_grouped(ids, **_first_only_kwargs(mapper.map_grouped, first_only))
+                return [grouped.get(id, []) for id in ids]
+        elif is_async_callable(mapper):
+            # Map the ids separately, but at most `max_workers` at once to not flood the backend of the mapper
+            semaphore = asyncio.Semaphore(self.settings.max_workers)
+
+            async def map_id(id):
+                async with semaphore:
+                    return (await mapper([id]))[0]
+
+            return list(await asyncio.gather(*(map_id(id) for id in ids)))
+        # Sync mappers are run in a worker thread to not block the event loop
+        return await anyio.to_thread.run_sync(self.__call_mapper, mapper, ids, first_only)
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.settings.max_workers, thread_name_prefix="id_mapping")
+        return self._executor
+
+    def shutdown(self):
+        """
+        Shuts down the thread pool of the concurrently applied mappers without waiting for running calls, i.e. when the server stops.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def __apply_mappings_concurrently(self, from_idtype, to_idtype, mappers: list, ids: list) -> list[list]:
+        """
+        Applies all mappers in the thread pool, and returns their results in the order of the mappers.
+        The `provider_timeout` of every mapper starts once it runs, and mappers exceeding it are skipped. Running threads cannot be stopped,
+        so a mapper is not called again until its timed out call finished, i.e. a hanging backend occupies at most one worker per mapper.
+        Mappers which cannot start within the timeout as all workers are busy are applied in the calling thread instead.
+        """
+        timeout = self.settings.provider_timeout
+        executor = self.__get_executor()
+        calls = []
+        for mapper in mappers:
+            if id(mapper) in self._timed_out:
+                _log.warning(
+                    "Skipping mapper %s from %s to %s, as its previous call is still running after its timeout",
+                    mapper,
+                    from_idtype,
+                    to_idtype,
+                )
+                continue
+            started = _Started()
+            calls.append((mapper, started, executor.submit(self.__apply_started, started, from_idtype, to_idtype, mapper, ids)))
+
+        results = []
+        for mapper, started, future in calls:
+            if timeout is None:
+                results.append(future.result())
+                continue
+            if not started.wait(timeout) and future.cancel():
+                # All workers are busy with other calls, which does not count against the timeout of the mapper
+                results.append(self.__apply_mapping(from_idtype, to_idtype, mapper, ids))
+                continue
+            # The call could not be cancelled, i.e. it is about to start if it has not already
+            started.wait()
+            try:
+                results.append(future.result(timeout=max(0, started.at + timeout - time.monotonic())))
+            except FutureTimeoutError:
+                self._timed_out[id(mapper)] = future
+                future.add_done_callback(lambda _, key=id(mapper): self._timed_out.pop(key, None))
+                _log.warning("Mapper %s from %s to %s timed out after %ss, skipping its results", mapper, from_idtype, to_idtype, timeout)
+        return results
+
+    def __apply_started(self, started: "_Started", from_idtype, to_idtype, mapper, ids: list) -> list:
+        started.set()
+        return self.__apply_mapping(from_idtype, to_idtype, mapper, ids)
+
+    async def __aapply_mappings_concurrently(self, from_idtype, to_idtype, mappers: list, ids: list) -> list[list]:
+        """
+        Applies all mappers concurrently on the event loop, and returns their results in the order of the mappers.
+        Mappers exceeding the `provider_timeout` are cancelled and skipped.
+        """
+        tasks = [asyncio.ensure_future(self.__aapply_mapping(from_idtype, to_idtype, mapper, ids)) for mapper in mappers]
+        timeout = self.settings.provider_timeout
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        results = []
+        for mapper, task in zip(mappers, tasks, strict=True):
+            if task in pending:
+                task.cancel()
+                _log.warning("Mapper %s from %s to %s timed out after %ss, skipping its results", mapper, from_idtype, to_idtype, timeout)
+            else:
+                results.append(task.result())
+        return results
+
+    @staticmethod
+    def unique_with_indices(ids) -> tuple[list, list[int]]:
+        """
+        Deduplicates the given ids while preserving their order.
+        For example, [a, b, a, c] becomes ([a, b, c], [0, 1, 0, 2])
+        :return: Tuple of the distinct ids and the index of every incoming id in the distinct ids
+        """
+        return unique_with_indices(ids)
+
+    @staticmethod
+    def merge_indexed_arrays(source, offsets, indices) -> list:
+        """
+        Merges the arrays source[indices[j]] for all j in [offsets[k], offsets[k + 1]) into the k-th result array.
+        For example, [[1], [2]] with offsets [0, 2, 3] and indices [1, 0, 1] becomes [[2, 1], [2]]
+        :return: Merged arrays
+        """
+        return merge_indexed_arrays(source, offsets, indices)
+
     def merge_2d_arrays(self, source, lengths):
         """
         Merges the arrays of the source array according to the lengths array
@@ -113,90 +633,346 @@ class MappingManager:
         assert len(lengths) > 0
         assert min(lengths) >= 1
         assert sum(lengths) == len(source)
-        result = []
-        i = 0
-        for length in lengths:
-            next_i = i + length
-            result.append(source[i] if length == 1 else list(chain.from_iterable(source[i:next_i])))
-            i = next_i
-        return result
+        return merge_sliced_arrays(source, [0, *accumulate(lengths)])
 
     def can_map(self, from_idtype, to_idtype):
-        return self.paths.get(from_idtype, {}).get(to_idtype)
+        path = self.graph.route(from_idtype, to_idtype)
+        return [path] if path else None
 
     def maps_to(self, from_idtype):
-        return list(self.paths.get(from_idtype, {}).keys())
+        return list(self.graph.routes_from(from_idtype).keys())
 
-    def __call__(self, from_idtype, to_idtype, ids) -> list:
+    def __call__(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        """
+        Maps the ids from `from_idtype` to `to_idtype`, returning the list of mapped ids for every id.
+        With `first_only`, only the first mapped id is kept after every hop, i.e. the results contain at most one id, and secondary
+        mappers of a hop are only called for the ids the previous ones could not map. Mappers accepting a `first_only` keyword are passed
+        the hint as well. This avoids the full one-to-many expansion, but the first id may differ from the full mapping if the first candidate of an intermediate hop cannot be mapped further.
+        """
         # If both id types are the same, simply return
         if from_idtype == to_idtype:
             return ids
 
-        # Get stored path instead of calculating them "on the fly"
-        # paths = self.__find_all_paths(self.graph, from_idtype, to_idtype)
-        paths = self.paths.get(from_idtype, {}).get(to_idtype)
+        # Materialized tables are used directly, only ids unknown to them are mapped via the path
+        table = self._materialized.get((from_idtype, to_idtype))
+        if table is not None:
+            results, missing = _lookup_materialized(table, ids, first_only)
+            return _fill_missing(results, self.__map(from_idtype, to_idtype, missing, first_only)) if missing else results
 
-        if not paths:
-            _log.warn("Cannot find mapping from %s to %s", from_idtype, to_idtype)
-            return [None for _ in ids]
+        return self.__map(from_idtype, to_idtype, ids, first_only)
 
-        # Traverse shortest path only for now
-        path = paths[0]
-        if len(path) < 2:
-            _log.warn("Invalid path given: %s", path)
-            return [None for _ in ids]
+    def __map(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        return self.__run(self.__traverse(from_idtype, to_idtype, ids, first_only))
+
+    def __run(self, traversal: Generator):
+        try:
+            hop = next(traversal)
+            while True:
+                hop = traversal.send(self.__resolve_single(*hop))
+        except StopIteration as e:
+            return e.value
+
+    async def amap(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        """
+        Async version of `__call__`. Async mappers are awaited directly, while sync mappers are run in a worker thread.
+        If no mapper on the route is async, the whole mapping is run in a worker thread. Otherwise, only the async mappers run on the event loop,
+        while the bookkeeping between the hops (i.e. deduplicating, regrouping and caching the ids) is run in worker threads.
+        """
+        if from_idtype == to_idtype:
+            return ids
+        if not self.__has_async_mappers(from_idtype, [to_idtype]):
+            return await anyio.to_thread.run_sync(self.__call__, from_idtype, to_idtype, ids, first_only)
+
+        table = self._materialized.get((from_idtype, to_idtype))
+        if table is not None:
+            results, missing = await anyio.to_thread.run_sync(_lookup_materialized, table, ids, first_only)
+            if not missing:
+                return results
+            return await anyio.to_thread.run_sync(_fill_missing, results, await self.__amap(from_idtype, to_idtype, missing, first_only))
+
+        return await self.__amap(from_idtype, to_idtype, ids, first_only)
+
+    async def __amap(self, from_idtype, to_idtype, ids, first_only=False) -> list:
+        return await self.__arun(self.__traverse(from_idtype, to_idtype, ids, first_only))
+
+    async def __arun(self, traversal: Generator):
+        # Only the hops are resolved on the event loop, the traversal itself is advanced in worker threads
+        step = await anyio.to_thread.run_sync(_send, traversal, None)
+        while not isinstance(step, StopIteration):
+            step = await anyio.to_thread.run_sync(_send, traversal, await self.__aresolve_single(*step))
+        return step.value
 
-        values = ids
-        needs_merging = False
-        lengths = []
-        # Iterate over from, to tuples
-        for i in range(1, len(path)):
-            from_type = path[i - 1]
-            to_type = path[i]
-            result = self.__resolve_single(from_type, to_type, values)
-
-            # Check if needs merging
-            if needs_merging:
-                result = self.merge_2d_arrays(result, lengths)
-
-            # Return on last iteration
-            if i == len(path) - 1:
-                return result
-
-            # Otherwise, check if every mapping was 1 to 1
-            lengths = [len(x) for x in result]  # type: ignore
-            # If any result array is longer than 1, we need to flatten and later merge it
-            needs_merging = max(lengths, default=0) > 1
-            # Flatten result and assign to values
-            values = list(chain.from_iterable(result))
-        return result  # type: ignore
+    def map_many(self, from_idtype, to_idtypes, ids, first_only=False) -> dict[str, list]:
+        """
+        Maps the ids to multiple idtypes at once, returning the mapped ids per target idtype.
+        Hops shared by the paths to multiple targets are only resolved once.
+        """
+        direct_targets, tree_targets = self.__split_targets(from_idtype, to_idtypes)
+        results = {to_idtype: self(from_idtype, to_idtype, ids, first_only) for to_idtype in direct_targets}
+        if tree_targets:
+            results.update(self.__run(self.__traverse_tree(from_idtype, tree_targets, ids, first_only)))
+        return {to_idtype: results[to_idtype] for to_idtype in to_idtypes}
+
+    async def amap_many(self, from_idtype, to_idtypes, ids, first_only=False) -> dict[str, list]:
+        """
+        Async version of `map_many`, running the whole mapping in a worker thread if no mapper on the routes is async (see `amap`).
+        """
+        if not self.__has_async_mappers(from_idtype, to_idtypes):
+            return await anyio.to_thread.run_sync(self.map_many, from_idtype, to_idtypes, ids, first_only)
+        direct_targets, tree_targets = self.__split_targets(from_idtype, to_idtypes)
+        results = {to_idtype: await self.amap(from_idtype, to_idtype, ids, first_only) for to_idtype in direct_targets}
+        if tree_targets:
+            results.update(await self.__arun(self.__traverse_tree(from_idtype, tree_targets, ids, first_only)))
+        return {to_idtype: results[to_idtype] for to_idtype in to_idtypes}
+
+    def __has_async_mappers(self, from_idtype, to_idtypes) -> bool:
+        """
+        Returns true if any mapper on the routes from `from_idtype` to the `to_idtypes` is async.
+        """
+        for to_idtype in to_idtypes:
+            path = self.graph.route(from_idtype, to_idtype) or []
+            for edge_from, edge_to in zip(path, path[1:]):
+                for mapper in self.mappers.get(edge_from, {}).get(edge_to, []):
+                    if is_async_callable(mapper) or is_async_callable(getattr(mapper, "map_grouped", None)):
+                        return True
+        return False
+
+    def __split_targets(self, from_idtype, to_idtypes) -> tuple[list[str], list[str]]:
+        """
+        Splits the distinct targets into the ones mapped directly, i.e. the source idtype itself or materialized mappings,
+        and the ones mapped via the tree of paths.
+        """
+        direct_targets = []
+        tree_targets = []
+        for to_idtype in dict.fromkeys(to_idtypes):
+            if to_idtype == from_idtype or (from_idtype, to_idtype) in self._materialized:
+                direct_targets.append(to_idtype)
+            else:
+                tree_targets.append(to_idtype)
+        return direct_targets, tree_targets
+
+    def map_chunks(self, from_idtype, to_idtype, ids, chunk_size: int, first_only=False) -> Iterator[list]:
+        """
+        Maps the ids in chunks of `chunk_size`, yielding the mapped chunks in the order of the ids.
+        """
+        for start in range(0, len(ids), chunk_size):
+            yield self(from_idtype, to_idtype, ids[start : start + chunk_size], first_only)
+
+    async def amap_chunks(self, from_idtype, to_idtype, ids, chunk_size: int, first_only=False) -> AsyncIterator[list]:
+        """
+        Async version of `map_chunks`.
+        """
+        for start in range(0, len(ids), chunk_size):
+            yield await self.amap(from_idtype, to_idtype, ids[start : start + chunk_size], first_only)
+
+    def __traverse(self, from_idtype, to_idtype, ids, first_only=False) -> Generator[tuple[str, str, list, bool], list, list]:
+        """
+        Traverses the path from `from_idtype` to `to_idtype`, shared by the sync and async mapping (see `__traverse_tree`).
+        """
+        results = yield from self.__traverse_tree(from_idtype, [to_idtype], ids, first_only)
+        return results[to_idtype]
+
+    def __traverse_tree(
+        self, from_idtype, to_idtypes, ids, first_only=False
+    ) -> Generator[tuple[str, str, list, bool], list, dict[str, list]]:
+        """
+        Traverses the paths from `from_idtype` to all `to_idtypes`, shared by the sync and async mapping.
+        Yields a (from_type, to_type, ids, first_only) tuple for every hop, expects the resolved results of these ids to be sent back,
+        and returns the final mapping of the incoming ids per target idtype.
+        As the cheapest paths from one idtype form a tree, hops shared by the paths to multiple targets are only resolved once.
+        """
+        if self.settings.adaptive_routing:
+            self.__refresh_weights()
+
+        results: dict[str, list] = {}
+        # Get the memoized cheapest paths instead of calculating all of them "on the fly", and merge them into a tree
+        children: dict[str, list[str]] = {}
+        for to_idtype in to_idtypes:
+            path = self.graph.route(from_idtype, to_idtype)
+            if not path:
+                _log.warn("Cannot find mapping from %s to %s", from_idtype, to_idtype)
+                results[to_idtype] = [None for _ in ids]
+                continue
+            for parent, child in zip(path, path[1:]):
+                siblings = children.setdefault(parent, [])
+                if child not in siblings:
+                    siblings.append(child)
+
+        # Every hop only resolves the distinct ids, the index array is used to scatter the results back
+        values, indices = unique_with_indices(ids)
+        # Depth-first traversal of the tree, with the distinct ids reached at every idtype in CSR form,
+        # such that the intermediate results are only regrouped into nested lists for the targets
+        stack = [(from_idtype, CSRMapping.from_ids(values))]
+        while stack:
+            from_type, mapping = stack.pop()
+            for to_type in children.get(from_type, []):
+                result = yield from_type, to_type, mapping.values, first_only
+                if first_only:
+                    # Only the first candidate of every id is mapped further
+                    result = _first(result)
+
+                if to_type in to_idtypes:
+                    # Regroup the results of the distinct intermediate ids into the distinct incoming ids
+                    grouped = mapping.regroup(result)
+                    results[to_type] = _scatter(grouped, indices)
+
+                if to_type in children:
+                    stack.append((to_type, mapping.then(result)))
+        return results
 
     def search(self, from_idtype, to_idtype, query, max_results=None):
         """
         Searches for matches in the names of the given idtype.
         This operation does not resolve transitive mappings.
+        The results of all mappers are ranked (see `rank_match`), and at most `max_results` are returned.
         :param query:
         :param max_results
         :return:
         """
-        from_mappings = self.mappers.get(from_idtype, {})
-        to_mappings = from_mappings.get(to_idtype, [])
-        to_mappings = [m for m in to_mappings if hasattr(m, "search")]
+        to_mappings = self.__find_search_mappers(from_idtype, to_idtype)
+        return top_search_results(
+            query, (_run_sync(self.__search_mapper(mapper, query, max_results)) for mapper in to_mappings), max_results
+        )
+
+    async def asearch(self, from_idtype, to_idtype, query, max_results=None):
+        """
+        Async version of `search`. Async searches are awaited directly, while sync ones are run in a worker thread.
+        """
+        to_mappings = self.__find_search_mappers(from_idtype, to_idtype)
+        results = []
+        for mapper in to_mappings:
+            if is_async_callable(getattr(mapper, "search", None)):
+                results.append(await mapper.search(query, max_results))
+            else:
+                results.append(await anyio.to_thread.run_sync(self.__search_mapper, mapper, query, max_results))
+        return top_search_results(query, results, max_results)
 
+    def __search_mapper(self, mapper, query, max_results):
+        # Mappers can either implement the search themselves, or expose a populated search index
+        if hasattr(mapper, "search"):
+            return mapper.search(query, max_results)
+        return mapper.search_index.search(query, max_results)
+
+    def __find_search_mappers(self, from_idtype, to_idtype) -> list:
+        to_mappings = [
+            m for m in self.mappers.get(from_idtype, {}).get(to_idtype, []) if hasattr(m, "search") or hasattr(m, "search_index")
+        ]
         if not to_mappings:
             _log.warn("cannot find mapping from %s to %s", from_idtype, to_idtype)
-            return []
+        return to_mappings
 
-        if len(to_mappings) == 1:
-            # single mapping no need for merging
-            return to_mappings[0].search(query, max_results)
 
-        rset = set()
-        for mapper in to_mappings:
-            results = mapper.search(query, max_results)
-            for r in results:
-                rset.add(r)
-        return list(rset)
+class _Started(threading.Event):
+    """
+    Event set once a mapper call started running in the thread pool, recording the time it started.
+    """
+
+    at: float = 0.0
+
+    def set(self):
+        self.at = time.monotonic()
+        super().set()
+
+
+def is_async_callable(fn) -> bool:
+    """
+    Returns true if the function, or the `__call__` of the callable object, is a coroutine function.
+    """
+    return inspect.iscoroutinefunction(fn) or (callable(fn) and inspect.iscoroutinefunction(type(fn).__call__))
+
+
+def _fill_missing(results: list, resolved: list) -> list:
+    """
+    Replaces the `MISSING` entries of the results with the resolved results, in order.
+    """
+    resolved_iter = iter(resolved)
+    return [next(resolved_iter) if r is MISSING else r for r in results]
+
+
+def _scatter(grouped: list, indices: list[int]) -> list:
+    """
+    Scatters the results of the distinct ids back to the incoming ids, copying the results of repeated ids such that no two rows share a list.
+    """
+    seen = set()
+    results = []
+    for j in indices:
+        r = grouped[j]
+        if j in seen and r is not None:
+            r = list(r)
+        seen.add(j)
+        results.append(r)
+    return results
+
+
+def _accepts_first_only(mapper) -> bool:
+    """
+    Returns true if the mapper accepts the `first_only` hint, i.e. if its `__call__` (or `map_grouped` if it does not preserve the order)
+    has a `first_only` keyword argument.
+    """
+    if getattr(mapper, "preserves_order", False):
+        return _has_first_only(mapper)
+    return hasattr(mapper, "map_grouped") and _has_first_only(mapper.map_grouped)
+
+
+def _has_first_only(fn) -> bool:
+    try:
+        return "first_only" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _first_only_kwargs(fn, first_only: bool) -> dict:
+    return {"first_only": True} if first_only and _has_first_only(fn) else {}
+
+
+def _lookup_materialized(table: MaterializedMapping, ids: list, first_only: bool) -> tuple[list, list]:
+    """
+    Looks up the ids in a materialized table, returning the results (`MISSING` for unknown ids) and the unknown ids.
+    """
+    results = [table.get(id, MISSING) for id in ids]
+    if first_only:
+        results = _first(results)
+    return results, [id for id, r in zip(ids, results, strict=True) if r is MISSING]
+
+
+def _send(traversal: Generator, value):
+    """
+    Sends a value into a traversal, returning its next hop, or the `StopIteration` holding its result, as it cannot be raised across threads.
+    """
+    try:
+        return traversal.send(value)
+    except StopIteration as e:
+        return e
+
+
+def _first(results: list) -> list:
+    """
+    Keeps only the first mapped id of every result.
+    """
+    return [r[:1] if r and r is not MISSING else r for r in results]
+
+
+def _merge_first_mapped(results: list, pending: list[int], mapped: list) -> list[int]:
+    """
+    Stores the mapped results of the pending indices, and returns the indices which are still unmapped.
+    """
+    for i, r in zip(pending, mapped, strict=True):
+        if r:
+            results[i] = r
+    return [i for i in pending if not results[i]]
+
+
+def _run_sync(result):
+    """
+    Runs the result of an async mapper to completion when it is used via the sync API.
+    """
+    if inspect.isawaitable(result):
+
+        async def wait():
+            return await result
+
+        return asyncio.run(wait())
+    return result
 
 
 def create_id_mapping_manager() -> MappingManager:
@@ -205,4 +981,7 @@ def create_id_mapping_manager() -> MappingManager:
     for plugin in manager.registry.list("mapping_provider"):
         providers = providers + list(plugin.load().factory())
     _log.info(f"Initializing MappingManager with {len(providers)} provider(s)")
-    return MappingManager(providers)
+    mapping_manager = MappingManager(providers, settings=manager.settings.visyn_core.id_mapping)
+    if mapping_manager.settings.materialize:
+        mapping_manager.materialize_in_background()
+    return mapping_manager
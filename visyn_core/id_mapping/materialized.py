@@ -0,0 +1,36 @@
+from array import array
+from itertools import accumulate, chain
+
+
+class MaterializedMapping:
+    """
+    Precomputed lookup table of a (transitive) mapping, i.e. from `MappingManager.materialize`.
+    The mapped ids of all keys are stored in one flat list, with the offsets of every key in a compact integer array.
+    """
+
+    def __init__(self, path: list[str], keys: list, results: list):
+        self.path = path
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._offsets = array("q", [0, *accumulate(len(r) if r else 0 for r in results)])
+        self._values = list(chain.from_iterable(r for r in results if r))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, id) -> bool:
+        return id in self._index
+
+    def get(self, id, default=None) -> list | None:
+        i = self._index.get(id)
+        if i is None:
+            return default
+        return self._values[self._offsets[i] : self._offsets[i + 1]]
+
+    def uses_edge(self, from_idtype: str | None, to_idtype: str | None) -> bool:
+        """
+        Returns true if the table was built via the given edge. Omitting `from_idtype` or `to_idtype` matches every idtype.
+        """
+        return any(
+            (from_idtype is None or edge_from == from_idtype) and (to_idtype is None or edge_to == to_idtype)
+            for edge_from, edge_to in zip(self.path, self.path[1:])
+        )
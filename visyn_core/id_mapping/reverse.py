@@ -0,0 +1,73 @@
+import threading
+from array import array
+from itertools import accumulate
+
+
+class ReverseMappingTable:
+    """
+    Mapper of the reverse edge of a forward mapper exposing its table via `items() -> Iterable[tuple[id, list[id]]]`,
+    registered by the `MappingManager` for forward mappers setting `reversible = True` instead of a hand-written reverse provider.
+    The inverted index is built lazily on first use: the forward keys are stored once, and the keys mapping to a target id
+    are stored as positions into them in one flat integer array, with the offsets of every target id in another one.
+    """
+
+    preserves_order = True
+
+    def __init__(self, forward):
+        self.forward = forward
+        self._lock = threading.Lock()
+        # The built (index, keys, offsets, positions), replaced as a whole such that concurrent calls never mix old and new parts
+        self._state: tuple[dict, list, array, array] | None = None
+
+    def __call__(self, ids: list) -> list[list]:
+        index, keys, offsets, positions = self._state or self.__build()
+        results = []
+        for id in ids:
+            row = index.get(id)
+            results.append([] if row is None else [keys[p] for p in positions[offsets[row] : offsets[row + 1]]])
+        return results
+
+    def keys(self) -> list:
+        index = (self._state or self.__build())[0]
+        return list(index)
+
+    def is_built(self) -> bool:
+        return self._state is not None
+
+    def reset(self):
+        """
+        Drops the inverted index, i.e. if the data of the forward mapper changed. It is rebuilt on the next call.
+        """
+        with self._lock:
+            self._state = None
+
+    def __build(self) -> tuple[dict, list, array, array]:
+        with self._lock:
+            if self._state is not None:
+                return self._state
+
+            keys = []
+            index: dict = {}
+            # All (target row, key position) pairs in the order of the forward table
+            rows = array("q")
+            key_positions = array("q")
+            for key, targets in self.forward.items():
+                position = len(keys)
+                keys.append(key)
+                for target in targets or []:
+                    rows.append(index.setdefault(target, len(index)))
+                    key_positions.append(position)
+
+            # Counting sort of the pairs by target row, which keeps the keys of every target id in the order of the forward table
+            counts = array("q", bytes(8 * len(index)))
+            for row in rows:
+                counts[row] += 1
+            offsets = array("q", [0, *accumulate(counts)])
+            next_positions = array("q", offsets[:-1])
+            positions = array("q", bytes(8 * len(rows)))
+            for row, position in zip(rows, key_positions):
+                positions[next_positions[row]] = position
+                next_positions[row] += 1
+
+            self._state = (index, keys, offsets, positions)
+            return self._state
@@ -0,0 +1,130 @@
+import heapq
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import Any
+
+
+def rank_match(query: str, match: str) -> tuple[int, int, str]:
+    """
+    Ranks a search match (lower is better): exact matches first, then prefix matches, then substring matches, then all others.
+    Within each of these groups, shorter matches come first, and equally long matches are sorted alphabetically.
+    """
+    q = query.lower()
+    m = match.lower()
+    if m == q:
+        kind = 0
+    elif m.startswith(q):
+        kind = 1
+    elif q in m:
+        kind = 2
+    else:
+        kind = 3
+    return kind, len(m), m
+
+
+def search_entry(result) -> tuple[Any, Any]:
+    """
+    Returns the (match, to) tuple of a search result, which is either a dict with `match` and `to` or a (match, to) tuple.
+    """
+    if isinstance(result, dict):
+        return result["match"], result["to"]
+    return result[0], result[1]
+
+
+def top_search_results(query: str, results_per_mapper: Iterable[list], max_results: int | None = None) -> list:
+    """
+    Merges the search results of multiple mappers into the `max_results` best ranked ones (see `rank_match`), dropping duplicates.
+    Results of equal rank keep the order of the mappers and of their results, such that the merge is deterministic.
+    """
+    seen = set()
+    candidates = []
+    for mapper_index, results in enumerate(results_per_mapper):
+        for position, result in enumerate(results):
+            entry = search_entry(result)
+            if entry in seen:
+                continue
+            seen.add(entry)
+            candidates.append((rank_match(query, str(entry[0])), mapper_index, position, result))
+
+    def key(candidate):
+        return candidate[:3]
+
+    top = heapq.nsmallest(max_results, candidates, key=key) if max_results is not None else sorted(candidates, key=key)
+    return [candidate[3] for candidate in top]
+
+
+class SearchIndex:
+    """
+    Case-insensitive prefix and n-gram index of the names of an idtype, i.e. to be populated by mappers supporting type-ahead search.
+    Mappers exposing such an index as `search_index` do not have to implement `search` themselves.
+    Prefix matches are found via binary search in the sorted names, substring matches via the intersection of the n-gram posting lists.
+    """
+
+    def __init__(self, ngram_size: int = 3):
+        self.ngram_size = ngram_size
+        self._names: list[str] = []
+        self._ids: list = []
+        self._lower: list[str] = []
+        self._ngrams: dict[str, list[int]] = {}
+        # (rows, names) sorted by the lowercase name, built lazily on the first search after adding names and replaced as a whole,
+        # such that concurrent searches never bisect names which do not belong to the rows
+        self._sorted: tuple[list[int], list[str]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def add(self, name: str, id):
+        row = len(self._names)
+        lower = name.lower()
+        self._names.append(name)
+        self._ids.append(id)
+        self._lower.append(lower)
+        for gram in {lower[i : i + self.ngram_size] for i in range(len(lower) - self.ngram_size + 1)}:
+            self._ngrams.setdefault(gram, []).append(row)
+        self._sorted = None
+
+    def add_many(self, entries: Iterable[tuple[str, Any]]):
+        for name, id in entries:
+            self.add(name, id)
+
+    def __prefix_rows(self, q: str) -> list[int]:
+        sorted_rows, sorted_names = self._sorted or self.__sort()
+        rows = []
+        for i in range(bisect_left(sorted_names, q), len(sorted_names)):
+            if not sorted_names[i].startswith(q):
+                break
+            rows.append(sorted_rows[i])
+        return rows
+
+    def __sort(self) -> tuple[list[int], list[str]]:
+        lower = self._lower[:]
+        sorted_rows = sorted(range(len(lower)), key=lower.__getitem__)
+        self._sorted = (sorted_rows, [lower[row] for row in sorted_rows])
+        return self._sorted
+
+    def __substring_rows(self, q: str) -> list[int]:
+        grams = {q[i : i + self.ngram_size] for i in range(len(q) - self.ngram_size + 1)}
+        postings = sorted((self._ngrams.get(gram, []) for gram in grams), key=len)
+        if not postings or not postings[0]:
+            return []
+        # Start with the shortest posting list, and verify the candidates as the n-grams may occur at other positions
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return [row for row in candidates if q in self._lower[row]]
+
+    def search(self, query: str, max_results: int | None = None) -> list[dict[str, Any]]:
+        """
+        Returns the `max_results` best matching names (see `rank_match`) as `{"match": name, "to": id}`.
+        Queries shorter than the n-gram size only match prefixes.
+        """
+        q = query.lower()
+        if not q:
+            return []
+        rows = set(self.__prefix_rows(q))
+        if len(q) >= self.ngram_size:
+            rows.update(self.__substring_rows(q))
+
+        def key(row):
+            return rank_match(q, self._lower[row]), row
+
+        top = heapq.nsmallest(max_results, rows, key=key) if max_results is not None else sorted(rows, key=key)
+        return [{"match": self._names[row], "to": self._ids[row]} for row in top]
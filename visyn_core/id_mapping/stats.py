@@ -0,0 +1,55 @@
+import threading
+
+
+class EdgeStats:
+    """
+    Observed latency and hit rate of the mappers of one (from_idtype, to_idtype) edge.
+    The mean duration is an exponentially weighted moving average, such that it follows changes in the latency of the backend.
+    """
+
+    def __init__(self, smoothing: float):
+        self.smoothing = smoothing
+        self.calls = 0
+        self.ids = 0
+        self.hits = 0
+        self.mean_duration: float | None = None
+
+    def record(self, duration: float, ids: int, hits: int):
+        self.calls += 1
+        self.ids += ids
+        self.hits += hits
+        self.mean_duration = (
+            duration if self.mean_duration is None else self.mean_duration + self.smoothing * (duration - self.mean_duration)
+        )
+
+    @property
+    def hit_rate(self) -> float | None:
+        """
+        Fraction of the ids which were mapped to at least one id.
+        """
+        return self.hits / self.ids if self.ids else None
+
+
+class MappingStats:
+    """
+    Thread-safe collection of the `EdgeStats` of all edges of the mapping graph.
+    """
+
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        self._edges: dict[tuple[str, str], EdgeStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, from_idtype: str, to_idtype: str, duration: float, ids: int, hits: int):
+        with self._lock:
+            edge = self._edges.get((from_idtype, to_idtype))
+            if edge is None:
+                edge = self._edges[(from_idtype, to_idtype)] = EdgeStats(self.smoothing)
+            edge.record(duration, ids, hits)
+
+    def get(self, from_idtype: str, to_idtype: str) -> EdgeStats | None:
+        return self._edges.get((from_idtype, to_idtype))
+
+    def items(self) -> list[tuple[tuple[str, str], EdgeStats]]:
+        with self._lock:
+            return list(self._edges.items())
@@ -0,0 +1,47 @@
+import logging
+
+from celery import shared_task
+from celery.backends.base import KeyValueStoreBackend
+
+from .. import manager
+from .idtype_api import to_first
+
+_log = logging.getLogger(__name__)
+
+
+def mapped_ids_key(job_id: str) -> str:
+    return f"visyn-core-mapped-ids-{job_id}"
+
+
+@shared_task(bind=True, name="visyn_core.id_mapping.map_ids")
+def map_ids(self, from_idtype: str, to_idtype: str, ids: list, first_only: bool = False, chunk_size: int = 10_000) -> dict:
+    """
+    Maps a large list of ids in chunks of `chunk_size`, publishing the number of mapped ids as `PROGRESS` state after every chunk.
+    With `first_only`, the result contains the first mapped id (or None) per id instead of the list of mapped ids.
+    The result of the task is only `{"done": ..., "total": ...}`, such that polling its state does not fetch all mapped ids:
+    these are stored separately under `mapped_ids_key` of key-value result backends (like Redis), and as `mapped` of the result otherwise.
+    """
+    total = len(ids)
+    mapped: list = []
+    self.update_state(state="PROGRESS", meta={"done": 0, "total": total})
+    for chunk in manager.id_mapping.map_chunks(from_idtype, to_idtype, ids, chunk_size, first_only=first_only):
+        mapped.extend(to_first(chunk) if first_only else chunk)
+        self.update_state(state="PROGRESS", meta={"done": len(mapped), "total": total})
+    _log.info(f"Mapped {total} ids from {from_idtype} to {to_idtype}")
+
+    if self.request.id and isinstance(self.backend, KeyValueStoreBackend):
+        self.backend.set(mapped_ids_key(self.request.id), self.backend.encode(mapped))
+        return {"done": total, "total": total}
+    return {"done": total, "total": total, "mapped": mapped}
+
+
+def load_mapped_ids(result) -> list | None:
+    """
+    Returns the mapped ids of a successful `map_ids` job, or None if they expired.
+    """
+    backend = result.backend
+    if isinstance(backend, KeyValueStoreBackend):
+        value = backend.get(mapped_ids_key(result.id))
+        if value is not None:
+            return backend.decode(value)
+    return result.result.get("mapped")
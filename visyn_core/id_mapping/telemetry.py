@@ -0,0 +1,43 @@
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import MeterProvider
+from opentelemetry.trace import Span, TracerProvider
+
+from .csr import count_ids
+
+
+class MappingTelemetry:
+    """
+    OpenTelemetry instrumentation of the `MappingManager`: a span for every hop, and histograms of the ids in, ids out,
+    fan-out ratio and duration of every mapper call, labelled by idtype pair and provider class.
+    Uses the global meter and tracer providers set up by `visyn_core.telemetry.init_telemetry` by default, i.e. no-ops if telemetry is disabled.
+    """
+
+    def __init__(self, meter_provider: MeterProvider | None = None, tracer_provider: TracerProvider | None = None):
+        meter = metrics.get_meter(__name__, meter_provider=meter_provider)
+        self.tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+        self.ids_in = meter.create_histogram("id_mapping.ids_in", unit="{id}", description="Number of ids sent to a mapper")
+        self.ids_out = meter.create_histogram("id_mapping.ids_out", unit="{id}", description="Number of ids returned by a mapper")
+        self.fan_out = meter.create_histogram("id_mapping.fan_out", unit="1", description="Ratio of the ids out to the ids in of a mapper")
+        self.duration = meter.create_histogram("id_mapping.duration", unit="s", description="Duration of a mapper call")
+
+    def hop(self, from_idtype: str, to_idtype: str, ids: list):
+        """
+        Returns the span context manager of a hop, which is completed via `end_hop`.
+        """
+        return self.tracer.start_as_current_span(
+            "id_mapping.hop",
+            attributes={"id_mapping.from_idtype": from_idtype, "id_mapping.to_idtype": to_idtype, "id_mapping.ids_in": len(ids)},
+        )
+
+    def end_hop(self, span: Span, result: list):
+        span.set_attribute("id_mapping.ids_out", count_ids(result))
+
+    def record(self, from_idtype: str, to_idtype: str, mapper, ids: list, result: list, duration: float):
+        ids_in = len(ids)
+        ids_out = count_ids(result)
+        attributes = {"from_idtype": from_idtype, "to_idtype": to_idtype, "provider": type(mapper).__name__}
+        self.ids_in.record(ids_in, attributes)
+        self.ids_out.record(ids_out, attributes)
+        if ids_in:
+            self.fan_out.record(ids_out / ids_in, attributes)
+        self.duration.record(duration, attributes)
@@ -129,6 +129,10 @@ def create_visyn_server(
 
     app.state.id_mapping = manager.id_mapping = create_id_mapping_manager()
 
+    @app.on_event("shutdown")
+    def shutdown_id_mapping():
+        manager.id_mapping.shutdown()
+
     # Load all namespace plugins as WSGIMiddleware plugins
     from fastapi.middleware.wsgi import WSGIMiddleware
 
@@ -270,6 +270,113 @@ class SentrySettings(BaseModel):
         return self.backend_proxy_to or self.proxy_to
 
 
+class IdMappingCacheSettings(BaseModel):
+    enabled: bool = False
+    """
+    Cache the results of every id mapping edge. Providers with changing data have to call `manager.id_mapping.invalidate(...)`.
+    """
+    maxsize: int = 100_000
+    """
+    Maximum number of cached (from_idtype, to_idtype, id) entries, the least recently used ones are evicted first.
+    """
+    ttl: float | None = 60 * 60
+    """
+    Time to live of a cached entry in seconds. If not set, entries only expire when they are evicted or invalidated.
+    """
+
+
+class IdMappingSettings(BaseModel):
+    cache: IdMappingCacheSettings = IdMappingCacheSettings()
+    """
+    Settings for the result cache of the id mapping manager.
+    """
+    parallel_providers: bool = False
+    """
+    Run the mapping providers registered for the same (from_idtype, to_idtype) pair concurrently instead of one after another.
+    """
+    max_workers: int = 8
+    """
+    Number of threads used to run the mapping providers concurrently if `parallel_providers` is enabled.
+    Also limits the number of concurrent calls of async mappers which map every id separately.
+    """
+    provider_timeout: float | None = None
+    """
+    Timeout in seconds for every mapping provider run concurrently, starting once the provider runs. The results of providers exceeding it are skipped,
+    and they are not called again until their timed out call finished.
+    """
+    default_cost: float = 1.0
+    """
+    Cost of a mapping provider not declaring its expected latency per call in seconds via `cost`. Routes with the lowest total cost are chosen.
+    """
+    adaptive_routing: bool = False
+    """
+    Choose routes by the observed mean latency of every edge instead of the static cost declared by the mapping providers.
+    """
+    adaptive_routing_min_calls: int = 10
+    """
+    Number of calls an edge has to be observed before its observed latency replaces the static cost.
+    """
+    adaptive_routing_interval: float = 60
+    """
+    Interval in seconds in which the routes are recomputed from the observed latencies.
+    """
+    materialize: list[tuple[str, str]] = []
+    """
+    (from_idtype, to_idtype) pairs which are precomputed into lookup tables in the background on startup, and rebuilt on invalidation.
+    """
+    materialize_chunk_size: int = 10_000
+    """
+    Number of ids mapped at once while materializing a mapping.
+    """
+    materialize_max_attempts: int = 3
+    """
+    Number of times a materialized mapping is built before giving up, if an edge of its path is invalidated during every build.
+    """
+    array_tables: list[str] = []
+    """
+    Directories of memory-mapped mapping tables registered as mapping providers (requires numpy, i.e. visyn_core[numpy]).
+    The tables are built via `build-mapping-table` and their pages are shared by all worker processes.
+    """
+    db_mappings: bool = False
+    """
+    Register a mapping provider for every `DBMapping` of the database connectors.
+    Disabled by default, as plugins may already register their own providers for these mappings, which would result in duplicate edges.
+    """
+    db_chunk_size: int = 1000
+    """
+    Maximum number of ids bound to the `IN :ids` list of a single query of a `DBMapping`.
+    """
+    db_temp_table_threshold: int = 10_000
+    """
+    Number of ids from which a `DBMapping` is queried via a temporary table of the ids instead of chunked `IN` lists.
+    On PostgreSQL, all ids are bound as a single array via `= ANY(:ids)` instead.
+    """
+
+
+class DBViewCacheSettings(BaseModel):
+    enabled: bool = False
+    """
+    Cache the results of DBViews declaring a TTL via `DBViewBuilder.cache(ttl)` when they are executed via `manager.db.execute_view(...)`.
+    Views with `no_cache` are never cached. Providers with changing data have to call `manager.db.invalidate_view_cache(table)`.
+    """
+    backend: Literal["memory", "redis"] = "memory"
+    """
+    Cache the results in a least-recently-used cache of every process, or in Redis to share them between all processes.
+    """
+    maxsize: int = 10_000
+    """
+    Maximum number of cached results of the memory backend, the least recently used ones are evicted first.
+    """
+    redis: dict[str, Any] | None = None
+    """
+    Connection of the Redis backend with `host`, `port` and `db`, defaulting to `get_default_redis_url()`.
+    """
+    key_prefix: str = "visyn_core:dbview:"
+    """
+    Prefix of all keys of the Redis backend.
+    """
+
+
 class VisynCoreSettings(BaseModel):
     main_app: str | None = None
     """
@@ -291,6 +398,14 @@ class VisynCoreSettings(BaseModel):
     """
     Settings for celery. If not set, celery will not be initialized.
     """
+    id_mapping: IdMappingSettings = IdMappingSettings()
+    """
+    Settings for the id mapping manager.
+    """
+    dbview_cache: DBViewCacheSettings = DBViewCacheSettings()
+    """
+    Settings for the shared result cache of DBViews.
+    """
     cypress: bool = False
     """
     @deprecated: Use `e2e` instead.
@@ -0,0 +1,2 @@
+# Celery tasks of visyn_core, discovered via `autodiscover_tasks` of the Celery app
+from .id_mapping.tasks import map_ids  # noqa: F401
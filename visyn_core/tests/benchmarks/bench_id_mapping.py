@@ -0,0 +1,224 @@
+"""
+Benchmarks for the id mapping. Run via `python -m visyn_core.tests.benchmarks.bench_id_mapping`,
+optionally with `--output results.json` to write machine-readable results for tracking regressions across releases.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+from ...id_mapping.manager import MappingManager
+from ...id_mapping.search import SearchIndex
+
+
+class IdentityMappingTable:
+    preserves_order = True
+
+    def __call__(self, ids):
+        return [[id] for id in ids]
+
+
+class SyntheticMappingTable:
+    """
+    Maps every id to `fan_out` distinct ids, sleeping `latency` seconds per call to simulate a remote backend.
+    """
+
+    preserves_order = True
+
+    def __init__(self, fan_out: int = 1, latency: float = 0.0):
+        self.fan_out = fan_out
+        self.latency = latency
+
+    def __call__(self, ids):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fan_out == 1:
+            return [[id] for id in ids]
+        return [[f"{id}.{k}" for k in range(self.fan_out)] for id in ids]
+
+
+class SearchMappingTable(IdentityMappingTable):
+    def __init__(self, names: list[str]):
+        self.search_index = SearchIndex()
+        self.search_index.add_many((name, name) for name in names)
+
+
+def generate_providers(idtypes: int, edges_per_idtype: int = 3, seed: int = 0) -> list[tuple[str, str, IdentityMappingTable]]:
+    """
+    Generates a connected mapping graph: every idtype maps to its successor and back, plus `edges_per_idtype` random edges.
+    """
+    rnd = random.Random(seed)
+    names = [f"IDTYPE{i}" for i in range(idtypes)]
+    providers = []
+    for i, name in enumerate(names[:-1]):
+        providers.append((name, names[i + 1], IdentityMappingTable()))
+        providers.append((names[i + 1], name, IdentityMappingTable()))
+    for name in names:
+        for other in rnd.sample(names, min(edges_per_idtype, idtypes)):
+            if other != name:
+                providers.append((name, other, IdentityMappingTable()))
+    return providers
+
+
+def generate_chain(hops: int, fan_out: int = 1, latency: float = 0.0) -> list[tuple[str, str, SyntheticMappingTable]]:
+    """
+    Generates a chain of `hops` edges, where only the first hop fans out such that the number of ids stays bounded.
+    """
+    return [(f"IDTYPE{i}", f"IDTYPE{i + 1}", SyntheticMappingTable(fan_out if i == 0 else 1, latency)) for i in range(hops)]
+
+
+def generate_ids(count: int, duplicates: float = 0.0, seed: int = 0) -> list[str]:
+    """
+    Generates `count` ids, of which the given fraction are duplicates of other ids.
+    """
+    rnd = random.Random(seed)
+    distinct = max(1, int(count * (1 - duplicates)))
+    return [f"ID{rnd.randrange(distinct) if i >= distinct else i}" for i in range(count)]
+
+
+def generate_names(count: int, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    return ["".join(rnd.choices(alphabet, k=rnd.randint(4, 12))) for _ in range(count)]
+
+
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    """
+    Returns the best of `repeat` runs in milliseconds, which is the least noisy estimate of the cost.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_startup(idtypes: int, edges_per_idtype: int = 3) -> dict[str, float]:
+    providers = generate_providers(idtypes, edges_per_idtype)
+
+    start = time.perf_counter()
+    mapper = MappingManager(providers)
+    constructed = time.perf_counter()
+    # Force the computation of all routes, which is otherwise done lazily on first use
+    for idtype in mapper.known_idtypes():
+        mapper.maps_to(idtype)
+    planned = time.perf_counter()
+
+    return {
+        "idtypes": idtypes,
+        "edges": len(providers),
+        "construct_ms": (constructed - start) * 1000,
+        "all_routes_ms": (planned - constructed) * 1000,
+    }
+
+
+def bench_call(hops: int, fan_out: int, ids: int, latency: float = 0.0, duplicates: float = 0.0, repeat: int = 3) -> dict[str, float]:
+    mapper = MappingManager(generate_chain(hops, fan_out, latency))
+    id_list = generate_ids(ids, duplicates)
+    duration = measure(lambda: mapper("IDTYPE0", f"IDTYPE{hops}", id_list), repeat)
+    return {
+        "hops": hops,
+        "fan_out": fan_out,
+        "ids": ids,
+        "latency_ms": latency * 1000,
+        "duplicates": duplicates,
+        "call_ms": duration,
+        "per_hop_ms": duration / hops,
+        "ids_per_s": ids / duration * 1000 if duration else float("inf"),
+    }
+
+
+def bench_merge(arrays: int, length: int, repeat: int = 3) -> dict[str, float]:
+    mapper = MappingManager([])
+    source = [[i] for i in range(arrays * length)]
+    lengths = [length] * arrays
+    return {"arrays": arrays, "length": length, "merge_ms": measure(lambda: mapper.merge_2d_arrays(source, lengths), repeat)}
+
+
+def bench_search(names: int, queries: int = 100, max_results: int = 10, repeat: int = 3) -> dict[str, float]:
+    name_list = generate_names(names)
+    mapper = MappingManager([("IDTYPE0", "IDTYPE1", SearchMappingTable(name_list))])
+    # Query prefixes and substrings of existing names, as a type-ahead search would
+    rnd = random.Random(0)
+    query_list = [
+        name[start : start + 3] for name in rnd.sample(name_list, min(queries, names)) for start in [rnd.randint(0, len(name) - 3)]
+    ]
+    # The index is built lazily on the first search
+    mapper.search("IDTYPE0", "IDTYPE1", query_list[0], max_results)
+    duration = measure(lambda: [mapper.search("IDTYPE0", "IDTYPE1", query, max_results) for query in query_list], repeat)
+    return {"names": names, "queries": len(query_list), "max_results": max_results, "per_query_ms": duration / len(query_list)}
+
+
+SUITES = ["startup", "call", "merge", "search"]
+
+
+def run(suites: list[str], sizes: list[int], edges_per_idtype: int, ids: list[int], repeat: int) -> dict[str, list[dict[str, float]]]:
+    results: dict[str, list[dict[str, float]]] = {}
+    if "startup" in suites:
+        results["startup"] = [bench_startup(size, edges_per_idtype) for size in sizes]
+    if "call" in suites:
+        results["call"] = [
+            *(bench_call(hops, 1, count, repeat=repeat) for hops in [1, 2, 4] for count in ids),
+            *(bench_call(2, fan_out, ids[0], repeat=repeat) for fan_out in [2, 5, 10]),
+            bench_call(2, 1, ids[0], duplicates=0.5, repeat=repeat),
+            *(bench_call(2, 1, ids[0], latency=latency, repeat=repeat) for latency in [0.001, 0.01]),
+        ]
+    if "merge" in suites:
+        results["merge"] = [bench_merge(count, length, repeat) for count in ids for length in [1, 5]]
+    if "search" in suites:
+        results["search"] = [bench_search(count, repeat=repeat) for count in ids]
+    return results
+
+
+def print_results(results: dict[str, list[dict[str, float]]]):
+    for suite, rows in results.items():
+        if not rows:
+            continue
+        columns = list(rows[0])
+        print(f"\n{suite}")
+        print(" ".join(f"{column:>14}" for column in columns))
+        for row in rows:
+            print(" ".join(f"{row[column]:>14.2f}" if isinstance(row[column], float) else f"{row[column]:>14}" for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup, mapping, merging and search of the MappingManager")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100, 200], help="Number of idtypes for the startup")
+    parser.add_argument("--edges-per-idtype", type=int, default=3)
+    parser.add_argument("--ids", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Number of ids, arrays or names")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs, of which the fastest one is reported")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.suites, args.sizes, args.edges_per_idtype, args.ids, args.repeat)
+    print_results(results)
+
+    if args.output:
+        try:
+            package_version = version("visyn_core")
+        except PackageNotFoundError:
+            package_version = None
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "version": package_version,
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from visyn_core.dbview import DBViewBuilder, add_common_queries, inject_where, limit_offset, statement_cache
+
+
+def create_genes(engine):
+    with engine.begin() as conn:
+        conn.execute(text("create table gene (id integer, symbol text, species text, chromosome text)"))
+        conn.execute(
+            text("insert into gene values (:id, :symbol, :species, :chromosome)"),
+            [
+                {"id": 1, "symbol": "BRCA1", "species": "human", "chromosome": "17"},
+                {"id": 2, "symbol": "BRCA2", "species": "human", "chromosome": "13"},
+                {"id": 3, "symbol": "TP53", "species": "human", "chromosome": "17"},
+                {"id": 4, "symbol": "Brca1", "species": "mouse", "chromosome": "11"},
+            ],
+        )
+    return engine
+
+
+@pytest.fixture
+def engine():
+    return create_genes(create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}))
+
+
+def test_execute(engine):
+    view = (
+        DBViewBuilder()
+        .query("SELECT id, {column} AS text FROM gene WHERE species = :species ORDER BY id")
+        .replace("column", ["symbol", "chromosome"])
+        .arg("species")
+        .build()
+    )
+    assert view.execute(engine, {"species": "human"}, {"column": "symbol"}) == [
+        {"id": 1, "text": "BRCA1"},
+        {"id": 2, "text": "BRCA2"},
+        {"id": 3, "text": "TP53"},
+    ]
+
+    with pytest.raises(ValueError, match="invalid replacement"):
+        view.execute(engine, {"species": "human"}, {"column": "id; DROP TABLE gene"})
+    with pytest.raises(ValueError, match="missing replacements"):
+        view.execute(engine, {"species": "human"})
+    with pytest.raises(ValueError, match="missing arguments"):
+        view.execute(engine, {}, {"column": "symbol"})
+    with pytest.raises(ValueError, match="invalid argument"):
+        view.execute(engine, {"species": "human", "other": 1}, {"column": "symbol"})
+
+
+def test_execute_list_arguments_and_limit(engine):
+    view = (
+        DBViewBuilder()
+        .query("SELECT id FROM gene WHERE id IN :ids ORDER BY id")
+        .arg("ids", type=int, as_list=True)
+        .call(limit_offset)
+        .build()
+    )
+    assert view.execute(engine, {"ids": ["1", "3", "4"], "query": None}, {"limit": 2, "offset": 1}) == [{"id": 3}, {"id": 4}]
+    with pytest.raises(ValueError, match="invalid replacement"):
+        view.execute(engine, {"ids": [1], "query": None}, {"limit": "1; --", "offset": 0})
+
+
+def test_execute_filters(engine):
+    view = (
+        DBViewBuilder()
+        .query("SELECT id FROM gene")
+        .call(inject_where)
+        .append(" ORDER BY id")
+        .filters(["species", "chromosome"], table="gene")
+        .build()
+    )
+    assert view.execute(engine) == [{"id": 1}, {"id": 2}, {"id": 3}, {"id": 4}]
+    assert view.execute(engine, filters={"species": "human", "chromosome": ["17", "11"]}) == [{"id": 1}, {"id": 3}]
+    assert view.execute(engine, filters={"!chromosome": ["17", "13"]}) == [{"id": 4}]
+    assert view.execute(engine, filters={"!species": "human"}) == [{"id": 4}]
+    with pytest.raises(ValueError, match="invalid filter"):
+        view.execute(engine, filters={"symbol": "TP53"})
+
+    # The generated where clauses and joins cannot be replaced by the caller
+    for key in ["where", "and_where", "joins"]:
+        with pytest.raises(ValueError, match="invalid replacement"):
+            view.execute(engine, replacements={key: "WHERE 1=1 UNION SELECT id FROM gene"}, filters={"species": "mouse"})
+    grouped = (
+        DBViewBuilder()
+        .query("SELECT id FROM gene {and_sub_where}")
+        .replace("and_sub_where")
+        .filter("species", table="gene", group="sub")
+        .build()
+    )
+    with pytest.raises(ValueError, match="invalid replacement"):
+        grouped.execute(engine, replacements={"and_sub_where": "OR 1=1"})
+
+
+def test_execute_statement_cache(engine):
+    view = (
+        DBViewBuilder()
+        .query("SELECT {column} AS text FROM gene WHERE id IN :ids")
+        .replace("column", ["symbol", "species"])
+        .arg("ids", as_list=True)
+        .build()
+    )
+    statement_cache.clear()
+    before = statement_cache.info()
+
+    statement, _ = view.prepare({"ids": [1]}, {"column": "symbol"})
+    # The statement is reused for other argument values, but not for other replacement values
+    assert view.prepare({"ids": [2, 3]}, {"column": "symbol"})[0] is statement
+    assert view.prepare({"ids": [1]}, {"column": "species"})[0] is not statement
+    assert view.execute(engine, {"ids": [2, 3]}, {"column": "symbol"}) == [{"text": "BRCA2"}, {"text": "TP53"}]
+
+    info = statement_cache.info()
+    assert info["misses"] - before["misses"] == 2
+    assert info["hits"] - before["hits"] == 2
+    assert info["size"] == 2
+
+
+def test_execute_callback(engine):
+    view = DBViewBuilder().callback(lambda engine, args, filters: [{"args": args, "filters": filters}]).build()
+    assert view.execute(engine, {"a": 1}) == [{"args": {"a": 1}, "filters": {}}]
+
+
+def test_stream_view(tmp_path):
+    from fastapi.testclient import TestClient
+
+    from visyn_core.dbmanager import DBManager
+
+    # A file database with a regular pool, such that the checked out connections can be counted
+    engine = create_genes(
+        create_engine(f"sqlite:///{tmp_path / 'genes.db'}", poolclass=QueuePool, connect_args={"check_same_thread": False})
+    )
+    db = DBManager()
+    view = DBViewBuilder().query("SELECT id, symbol FROM gene WHERE species = :species ORDER BY id").arg("species").build()
+
+    chunks = db.stream_view(engine, view, {"species": "human"}, chunk_size=2)
+    assert next(chunks) == [{"id": 1, "symbol": "BRCA1"}, {"id": 2, "symbol": "BRCA2"}]
+    assert engine.pool.checkedout() == 1
+    # Closing the stream early, i.e. if the client disconnects, returns the connection to the pool
+    chunks.close()
+    assert engine.pool.checkedout() == 0
+    assert list(db.stream_view(engine, view, {"species": "mouse"}, chunk_size=2)) == [[{"id": 4, "symbol": "Brca1"}]]
+
+    app = FastAPI()
+    app.get("/genes")(lambda: db.stream_view_response(engine, view, {"species": "human"}, chunk_size=2))
+    response = TestClient(app).get("/genes")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"id": 1, "symbol": "BRCA1"},
+        {"id": 2, "symbol": "BRCA2"},
+        {"id": 3, "symbol": "TP53"},
+    ]
+    assert engine.pool.checkedout() == 0
+
+
+def test_stream_view_arrow(engine):
+    pa = pytest.importorskip("pyarrow")
+    from fastapi.testclient import TestClient
+
+    from visyn_core.dbmanager import DBManager
+
+    db = DBManager()
+    view = (
+        DBViewBuilder()
+        .query("SELECT id, symbol, species, chromosome FROM gene WHERE species = :species ORDER BY id")
+        .arg("species")
+        .column("id", type="number")
+        .column("species", type="categorical")
+        .build()
+    )
+
+    app = FastAPI()
+    app.get("/genes")(lambda species, accept: db.stream_view_response(engine, view, {"species": species}, chunk_size=2, accept=accept))
+    client = TestClient(app)
+
+    response = client.get("/genes", params={"species": "human", "accept": "application/json;q=0.5, application/vnd.apache.arrow.stream"})
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.field("id").type == pa.float64()
+    assert table.schema.field("symbol").type == pa.string()
+    assert table.schema.field("species").type == pa.dictionary(pa.int32(), pa.string())
+    assert table.to_pylist() == [
+        {"id": 1.0, "symbol": "BRCA1", "species": "human", "chromosome": "17"},
+        {"id": 2.0, "symbol": "BRCA2", "species": "human", "chromosome": "13"},
+        {"id": 3.0, "symbol": "TP53", "species": "human", "chromosome": "17"},
+    ]
+
+    # Queries without rows still return the schema
+    empty = pa.ipc.open_stream(client.get("/genes", params={"species": "rat", "accept": "application/vnd.apache.arrow.stream"}).content)
+    assert empty.schema.names == ["id", "symbol", "species", "chromosome"]
+    assert empty.read_all().num_rows == 0
+
+    response = client.get(
+        "/genes", params={"species": "mouse", "accept": "application/vnd.apache.arrow.stream;q=0.1, application/x-ndjson"}
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert json.loads(response.text) == {"id": 4, "symbol": "Brca1", "species": "mouse", "chromosome": "11"}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        pass
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def sadd(self, key, *members):
+        self.values.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return self.values.get(key, set())
+
+    def expire(self, key, seconds, **kwargs):
+        pass
+
+    def scan_iter(self, match):
+        return [key for key in self.values if key.startswith(match.rstrip("*"))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis"])
+def test_execute_view_cache(engine, backend):
+    from visyn_core.dbmanager import DBManager
+    from visyn_core.dbview import DBConnector
+    from visyn_core.dbview_cache import MemoryDBViewResultCache, RedisDBViewResultCache
+
+    queries = {}
+    add_common_queries(queries, "gene", "GeneSymbol", "id", columns=["symbol", "species"], cache_ttl=60)
+    queries["uncached"] = DBViewBuilder().query("SELECT count(*) AS n FROM gene").build()
+    queries["no_cache"] = DBViewBuilder().query("SELECT count(*) AS n FROM gene").cache(60).no_cache().build()
+    queries["count"] = DBViewBuilder().query("SELECT count(*) AS n FROM gene").cache(60, ["gene"]).build()
+
+    db = DBManager()
+    db.connectors["genes"] = DBConnector(views=queries)
+    db._engines["genes"] = engine
+    db.view_cache = MemoryDBViewResultCache(100) if backend == "memory" else RedisDBViewResultCache(FakeRedis())
+
+    species = [{"text": "human"}, {"text": "mouse"}]
+    assert db.execute_view("genes", "gene_unique_all", replacements={"column": "species"}) == species
+    # Modifying the returned rows does not change the cached ones
+    db.execute_view("genes", "gene_unique_all", replacements={"column": "species"})[0]["text"] = "changed"
+    assert db.execute_view("genes", "gene_unique_all", replacements={"column": "species"}) == species
+    for name in ["uncached", "no_cache", "count"]:
+        assert db.execute_view("genes", name) == [{"n": 4}]
+
+    with engine.begin() as conn:
+        conn.execute(text("insert into gene values (5, 'Tp53', 'rat', '10')"))
+    assert db.execute_view("genes", "gene_unique_all", replacements={"column": "species"}) == species
+    assert db.execute_view("genes", "count") == [{"n": 4}]
+    assert db.execute_view("genes", "uncached") == [{"n": 5}]
+    assert db.execute_view("genes", "no_cache") == [{"n": 5}]
+    # Other replacements are cached separately
+    assert len(db.execute_view("genes", "gene_unique_all", replacements={"column": "symbol"})) == 5
+
+    db.invalidate_view_cache("other")
+    assert db.execute_view("genes", "count") == [{"n": 4}]
+    db.invalidate_view_cache("gene")
+    assert db.execute_view("genes", "count") == [{"n": 5}]
+    assert db.execute_view("genes", "gene_unique_all", replacements={"column": "species"}) == [*species, {"text": "rat"}]
+
+
+def test_redis_dbview_cache_types():
+    import datetime
+    import decimal
+    import uuid
+
+    from visyn_core.dbview_cache import RedisDBViewResultCache
+
+    cache = RedisDBViewResultCache(FakeRedis())
+    rows = [
+        {
+            "date": datetime.date(2024, 2, 29),
+            "datetime": datetime.datetime(2024, 2, 29, 12, 30, tzinfo=datetime.timezone.utc),
+            "time": datetime.time(12, 30, 15),
+            "duration": datetime.timedelta(hours=1, microseconds=5),
+            "price": decimal.Decimal("10.50"),
+            "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "data": b"\x00\x01",
+            "tags": ["a", 1, None],
+        }
+    ]
+    cache.set("key", rows, 60, ["gene"])
+    # Values without a JSON type are returned with the same types as on a cache miss
+    cached = cache.get("key")
+    assert cached == rows
+    assert [type(value) for value in cached[0].values()] == [type(value) for value in rows[0].values()]
+
+    with pytest.raises(TypeError):
+        cache.set("other", [{"value": object()}], 60, [])
+
+
+def test_dbview_cache_key():
+    from visyn_core.dbview_cache import dbview_cache_key, security_scope
+
+    assert dbview_cache_key("db", "view", None, "public", {"a": 1, "b": [2]}) == dbview_cache_key(
+        "db", "view", None, "public", {"b": [2], "a": 1}
+    )
+    assert dbview_cache_key("db", "view", None, "public", {"a": 1}) != dbview_cache_key("db", "view", None, "role:admin", {"a": 1})
+    assert security_scope(DBViewBuilder().build()) == "public"
+    assert security_scope(DBViewBuilder().security("admin").build()) == "role:admin"
+
+
+def test_keyset_paginate(engine):
+    from visyn_core.dbview import decode_cursor, encode_cursor
+
+    queries = {}
+    add_common_queries(queries, "gene", "GeneSymbol", "id AS id", columns=["symbol", "species", "chromosome"])
+    items = queries["gene_items_keyset"]
+
+    pages = []
+    cursor = None
+    while True:
+        rows, cursor = items.paginate(engine, cursor, 2, {"query": "%"}, {"column": "chromosome"})
+        pages.append(rows)
+        if cursor is None:
+            break
+    # Rows with the same text are ordered by their id
+    assert pages == [
+        [{"id": 4, "text": "11"}, {"id": 2, "text": "13"}],
+        [{"id": 1, "text": "17"}, {"id": 3, "text": "17"}],
+        [],
+    ]
+
+    unique = queries["gene_unique_keyset"]
+    rows, cursor = unique.paginate(engine, None, 2, {"query": "%"}, {"column": "chromosome"})
+    assert rows == [{"id": "11", "text": "11"}, {"id": "13", "text": "13"}]
+    assert decode_cursor(cursor, 1) == ["13"]
+    assert unique.paginate(engine, cursor, 2, {"query": "%"}, {"column": "chromosome"}) == ([{"id": "17", "text": "17"}], None)
+
+    with pytest.raises(ValueError, match="invalid cursor"):
+        items.paginate(engine, encode_cursor(["13"]), 2, {"query": "%"}, {"column": "chromosome"})
+    with pytest.raises(ValueError, match="invalid cursor"):
+        items.paginate(engine, "not a cursor", 2, {"query": "%"}, {"column": "chromosome"})
+    with pytest.raises(ValueError, match="not paginated"):
+        queries["gene_items"].paginate(engine)
+
+
+def test_inject_where_clause():
+    from visyn_core.dbview import inject_where_clause
+
+    # The clause is injected before the order by of queries without a where clause
+    assert inject_where_clause(DBViewBuilder().query("SELECT id FROM gene ORDER BY id"), "id > 1").build().query == (
+        "SELECT id FROM gene WHERE id > 1  ORDER BY id"
+    )
@@ -1,6 +1,212 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import ANY, patch
+
 import pytest
 
+from visyn_core import manager
+from visyn_core.id_mapping.idtype_api import to_first
 from visyn_core.id_mapping.manager import MappingManager
+from visyn_core.id_mapping.search import SearchIndex
+from visyn_core.settings.model import IdMappingCacheSettings, IdMappingSettings
+
+
+class OneToOneMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+
+    def __call__(self, ids):
+        return [[id] for id in ids]
+
+
+class OneToTwoMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+
+    def __call__(self, ids):
+        return [[id * 2] for id in ids]
+
+
+class TwoToOneMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+
+    def __call__(self, ids):
+        return [[id / 2] for id in ids]
+
+
+class OneToMoreMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+
+    def __call__(self, ids):
+        return [[id, id * 2, id * 3] for id in ids]
+
+
+class GroupedMappingTable:
+    """
+    Mapping table without a defined order, returning the results keyed by the incoming ids (and no result for 1).
+    """
+
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+        self.calls = 0
+
+    def __call__(self, ids):
+        raise AssertionError("map_grouped should be preferred over the per-id mapping")
+
+    def map_grouped(self, ids):
+        self.calls += 1
+        return {id: [id * 2] for id in reversed(ids) if id != 1}
+
+
+class CountingMappingTable(OneToMoreMappingTable):
+    preserves_order = True
+
+    def __init__(self, from_idtype, to_idtype):
+        super().__init__(from_idtype, to_idtype)
+        self.ids = []
+
+    def __call__(self, ids):
+        self.ids.extend(ids)
+        return super().__call__(ids)
+
+
+class EmptyMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+
+    def __call__(self, ids):
+        return [[] for _ in ids]
+
+
+class SlowMappingTable:
+    preserves_order = True
+
+    def __init__(self, from_idtype, to_idtype, delay, factor):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+        self.delay = delay
+        self.factor = factor
+
+    def __call__(self, ids):
+        time.sleep(self.delay)
+        return [[id * self.factor] for id in ids]
+
+
+class AsyncMappingTable:
+    preserves_order = True
+
+    def __init__(self, from_idtype, to_idtype, delay=0):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+        self.delay = delay
+
+    async def __call__(self, ids):
+        await asyncio.sleep(self.delay)
+        return [[id * 2] for id in ids]
+
+    async def search(self, query, max_results):
+        return [{"match": query, "to": query * 2}]
+
+
+class AsyncLegacyMappingTable:
+    def __init__(self, from_idtype, to_idtype):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, ids):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return [[id * 2] for id in ids]
+
+
+class CostlyMappingTable(OneToOneMappingTable):
+    def __init__(self, from_idtype, to_idtype, cost):
+        super().__init__(from_idtype, to_idtype)
+        self.cost = cost
+
+
+class DictMappingTable:
+    preserves_order = True
+
+    def __init__(self, from_idtype, to_idtype, data):
+        self.from_idtype = from_idtype
+        self.to_idtype = to_idtype
+        self.data = data
+
+    def __call__(self, ids):
+        return [self.data.get(id, []) for id in ids]
+
+    def keys(self):
+        return list(self.data.keys())
+
+
+class ReversibleMappingTable(DictMappingTable):
+    reversible = True
+
+    def __init__(self, from_idtype, to_idtype, data):
+        super().__init__(from_idtype, to_idtype, data)
+        self.items_calls = 0
+
+    def items(self):
+        self.items_calls += 1
+        return self.data.items()
+
+
+class IndexedMappingTable(OneToOneMappingTable):
+    def __init__(self, from_idtype, to_idtype, names):
+        super().__init__(from_idtype, to_idtype)
+        self.search_index = SearchIndex()
+        self.search_index.add_many(names)
+
+
+class SearchMappingTable(OneToOneMappingTable):
+    def __init__(self, from_idtype, to_idtype, results):
+        super().__init__(from_idtype, to_idtype)
+        self.results = results
+
+    def search(self, query, max_results):
+        return self.results[:max_results]
+
+
+class InvalidatingMappingTable(OneToOneMappingTable):
+    def __init__(self, from_idtype, to_idtype):
+        super().__init__(from_idtype, to_idtype)
+        self.calls = 0
+        self.on_call = None
+
+    def __call__(self, ids):
+        self.calls += 1
+        self.on_call()
+        return super().__call__(ids)
+
+
+class FirstOnlyMappingTable(OneToMoreMappingTable):
+    preserves_order = True
+
+    def __init__(self, from_idtype, to_idtype):
+        super().__init__(from_idtype, to_idtype)
+        self.hints = []
+
+    def __call__(self, ids, first_only=False):
+        self.hints.append(first_only)
+        results = super().__call__(ids)
+        return [r[:1] for r in results] if first_only else results
 
 
 @pytest.fixture(scope="module")
@@ -64,6 +270,17 @@ def test_merge_2d_arrays_invalid_length(mapper):
         mapper.merge_2d_arrays([[]], [-1, 1])
 
 
+def test_unique_with_indices(mapper):
+    assert mapper.unique_with_indices([]) == ([], [])
+    assert mapper.unique_with_indices([3, 1, 3, 2, 1]) == ([3, 1, 2], [0, 1, 0, 2, 1])
+
+
+def test_merge_indexed_arrays(mapper):
+    assert mapper.merge_indexed_arrays([], [0], []) == []
+    assert mapper.merge_indexed_arrays([[1], [2]], [0, 2, 3], [1, 0, 1]) == [[2, 1], [2]]
+    assert mapper.merge_indexed_arrays([[1], [2]], [0, 0, 1], [0]) == [[], [1]]
+
+
 def test_known_idtypes(mapper):
     assert mapper.known_idtypes() == {"ID1", "ID2", "ID3", "ID4", "ID5", "ID6", "ID7"}
 
@@ -77,6 +294,35 @@ def test_maps_to(mapper):
     assert set(mapper.maps_to("ID6")) == {"ID7"}
 
 
+def test_can_map(mapper):
+    assert mapper.can_map("ID1", "ID2") == [["ID1", "ID2"]]
+    assert mapper.can_map("ID1", "ID3") == [["ID1", "ID2", "ID3"]]
+    assert mapper.can_map("ID5", "ID7") == [["ID5", "ID6", "ID7"]]
+    assert not mapper.can_map("ID7", "ID5")
+    assert not mapper.can_map("ID1", "ID5")
+    assert not mapper.can_map("UNKNOWN", "ID1")
+
+
+def test_paths(mapper):
+    assert set(mapper.paths.keys()) == mapper.known_idtypes()
+    assert mapper.paths["ID1"]["ID3"] == [["ID1", "ID2", "ID3"]]
+    assert mapper.paths["ID7"] == {}
+    assert mapper.paths.get("UNKNOWN", {}).get("ID1") is None
+
+
+def test_large_graph():
+    # A densely connected graph would never finish when enumerating all simple paths
+    idtypes = [f"ID{i}" for i in range(200)]
+    providers = [(a, b, OneToOneMappingTable(a, b)) for i, a in enumerate(idtypes) for b in idtypes[i + 1 : i + 4]]
+    providers += [(b, a, OneToOneMappingTable(b, a)) for a, b, _ in providers]
+    mapper = MappingManager(providers)
+
+    assert len(mapper.maps_to("ID0")) == 199
+    assert mapper.can_map("ID0", "ID199")[0][-1] == "ID199"
+    assert len(mapper.can_map("ID0", "ID199")[0]) == 68
+    assert mapper("ID0", "ID199", [1, 2]) == [[1], [2]]
+
+
 def test_single_mapping(mapper):
     assert mapper("ID1", "ID2", [2]) == [[4]]
     assert mapper("ID1", "ID4", [2]) == [[4]]
@@ -102,37 +348,841 @@ def test_transitive_merge_mapping(mapper):
     assert mapper("ID5", "ID7", [2, 4]) == [[2, 4, 6, 4, 8, 12, 6, 12, 18], [4, 8, 12, 8, 16, 24, 12, 24, 36]]
 
 
-class OneToOneMappingTable:
-    def __init__(self, from_idtype, to_idtype):
-        self.from_idtype = from_idtype
-        self.to_idtype = to_idtype
+def test_deduplicated_mapping():
+    counting = CountingMappingTable("ID6", "ID7")
+    mapper = MappingManager([("ID5", "ID6", OneToMoreMappingTable("ID5", "ID6")), ("ID6", "ID7", counting)])
 
-    def __call__(self, ids):
-        return [[id] for id in ids]
+    # 2 -> [2, 4, 6] and 4 -> [4, 8, 12] only share the intermediate id 4
+    assert mapper("ID5", "ID7", [2, 4, 2]) == [
+        [2, 4, 6, 4, 8, 12, 6, 12, 18],
+        [4, 8, 12, 8, 16, 24, 12, 24, 36],
+        [2, 4, 6, 4, 8, 12, 6, 12, 18],
+    ]
+    assert counting.ids == [2, 4, 6, 8, 12]
+    assert mapper("ID6", "ID7", [1, 1, 1]) == [[1, 2, 3], [1, 2, 3], [1, 2, 3]]
 
+    # Repeated ids do not share the list of their results
+    results = mapper("ID5", "ID7", [1, 1])
+    results[0].append(99)
+    assert results[1] == [1, 2, 3, 2, 4, 6, 3, 6, 9]
+    results = mapper("ID6", "ID7", [1, 1])
+    assert results[0] is not results[1]
 
-class OneToTwoMappingTable:
-    def __init__(self, from_idtype, to_idtype):
-        self.from_idtype = from_idtype
-        self.to_idtype = to_idtype
 
-    def __call__(self, ids):
-        return [[id * 2] for id in ids]
+def test_transitive_mapping_without_result():
+    mapper = MappingManager([("ID5", "ID6", EmptyMappingTable("ID5", "ID6")), ("ID6", "ID7", OneToMoreMappingTable("ID6", "ID7"))])
+    assert mapper("ID5", "ID7", [1, 2]) == [[], []]
 
+    mapper = MappingManager([("ID5", "ID6", OneToMoreMappingTable("ID5", "ID6")), ("ID6", "ID7", EmptyMappingTable("ID6", "ID7"))])
+    assert mapper("ID5", "ID7", [1, 2]) == [[], []]
 
-class TwoToOneMappingTable:
-    def __init__(self, from_idtype, to_idtype):
-        self.from_idtype = from_idtype
-        self.to_idtype = to_idtype
 
-    def __call__(self, ids):
-        return [[id / 2] for id in ids]
+def test_cached_mapping():
+    counting = CountingMappingTable("ID1", "ID2")
+    mapper = MappingManager(
+        [("ID1", "ID2", counting), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))],
+        settings=IdMappingSettings(cache=IdMappingCacheSettings(enabled=True, maxsize=3)),
+    )
 
+    assert mapper("ID1", "ID2", [1, 2]) == [[1, 2, 3], [2, 4, 6]]
+    assert mapper("ID1", "ID2", [2, 3, 1]) == [[2, 4, 6], [3, 6, 9], [1, 2, 3]]
+    assert counting.ids == [1, 2, 3]
+    assert mapper.cache_info() == {"hits": 2, "misses": 3, "size": 3, "maxsize": 3, "ttl": 3600}
 
-class OneToMoreMappingTable:
-    def __init__(self, from_idtype, to_idtype):
-        self.from_idtype = from_idtype
-        self.to_idtype = to_idtype
+    # The least recently used id 2 is evicted
+    assert mapper("ID1", "ID2", [4]) == [[4, 8, 12]]
+    assert mapper("ID1", "ID2", [2]) == [[2, 4, 6]]
+    assert counting.ids == [1, 2, 3, 4, 2]
 
-    def __call__(self, ids):
-        return [[id, id * 2, id * 3] for id in ids]
+    # Other edges are not affected by the invalidation
+    mapper("ID2", "ID3", [1])
+    mapper.invalidate(from_idtype="ID1")
+    assert mapper.cache_info()["size"] == 1
+    assert mapper("ID1", "ID2", [1]) == [[1, 2, 3]]
+    assert counting.ids == [1, 2, 3, 4, 2, 1]
+
+    # Modifying the returned results does not change the cached ones
+    result = mapper("ID1", "ID2", [5, 6])
+    result[0].append(99)
+    mapper("ID1", "ID2", [5])[0].append(99)
+    assert mapper("ID1", "ID2", [5]) == [[5, 10, 15]]
+
+    mapper.invalidate()
+    assert mapper.cache_info()["size"] == 0
+
+
+def test_uncached_mapping(mapper):
+    assert mapper.cache_info() is None
+
+
+def test_parallel_providers():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0.2, factor=1)),
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0.1, factor=2)),
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0.2, factor=1)),
+        ],
+        settings=IdMappingSettings(parallel_providers=True),
+    )
+
+    start = time.monotonic()
+    # The results are merged in the order of the providers, regardless of which one finished first
+    assert mapper("ID1", "ID2", [1, 2]) == [[1, 2], [2, 4]]
+    assert time.monotonic() - start < 0.4
+
+
+def test_parallel_providers_timeout():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=1, factor=1)),
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0, factor=2)),
+        ],
+        settings=IdMappingSettings(parallel_providers=True, provider_timeout=0.1),
+    )
+
+    start = time.monotonic()
+    assert mapper("ID1", "ID2", [1, 2]) == [[2], [4]]
+    assert time.monotonic() - start < 0.5
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_parallel_providers_repeated_timeouts(max_workers):
+    slow = SlowMappingTable("ID1", "ID2", delay=1, factor=1)
+    fast = SlowMappingTable("ID1", "ID2", delay=0, factor=2)
+    mapper = MappingManager(
+        [("ID1", "ID2", slow), ("ID1", "ID2", fast)],
+        settings=IdMappingSettings(parallel_providers=True, provider_timeout=0.2, max_workers=max_workers),
+    )
+
+    # The timed out call of the slow mapper keeps its worker busy, which must neither time out the fast mapper nor let the slow one take more workers
+    for _ in range(3):
+        start = time.monotonic()
+        assert mapper("ID1", "ID2", [1, 2]) == [[2], [4]]
+        assert time.monotonic() - start < 0.7
+    mapper.shutdown()
+
+
+def test_async_mapping():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", AsyncMappingTable("ID1", "ID2")),
+            ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3")),
+            ("ID2", "ID3", AsyncMappingTable("ID2", "ID3")),
+        ]
+    )
+
+    assert asyncio.run(mapper.amap("ID1", "ID2", [1, 2])) == [[2], [4]]
+    assert asyncio.run(mapper.amap("ID1", "ID3", [1, 2])) == [[2, 4, 6], [4, 8, 12]]
+    assert asyncio.run(mapper.asearch("ID1", "ID2", "1", 10)) == [{"match": "1", "to": "11"}]
+    # Async mappers can also be used via the sync API
+    assert mapper("ID1", "ID3", [1, 2]) == [[2, 4, 6], [4, 8, 12]]
+    assert mapper.search("ID1", "ID2", "1", 10) == [{"match": "1", "to": "11"}]
+
+
+def test_async_legacy_mapping_concurrency():
+    legacy = AsyncLegacyMappingTable("ID1", "ID2")
+    mapper = MappingManager([("ID1", "ID2", legacy)], IdMappingSettings(max_workers=3))
+
+    # Every id is mapped separately, but at most max_workers at once
+    assert asyncio.run(mapper.amap("ID1", "ID2", list(range(10)))) == [[id * 2] for id in range(10)]
+    assert legacy.calls == 10
+    assert legacy.max_running == 3
+
+
+@pytest.mark.parametrize("async_mapper", [False, True])
+def test_async_mapping_off_event_loop(async_mapper):
+    import threading
+
+    from visyn_core.id_mapping import manager as manager_module
+
+    first = AsyncMappingTable("ID1", "ID2") if async_mapper else OneToTwoMappingTable("ID1", "ID2")
+    mapper = MappingManager(
+        [("ID1", "ID2", first), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))],
+        IdMappingSettings(cache=IdMappingCacheSettings(enabled=True)),
+    )
+    threads = []
+    unique_with_indices = manager_module.unique_with_indices
+
+    def record_thread(ids):
+        threads.append(threading.get_ident())
+        return unique_with_indices(ids)
+
+    async def amap():
+        results = await mapper.amap("ID1", "ID3", [1, 2, 1])
+        results_many = await mapper.amap_many("ID1", ["ID2", "ID3"], [1, 2, 1])
+        return threading.get_ident(), results, results_many
+
+    with patch.object(manager_module, "unique_with_indices", record_thread):
+        loop_thread, results, results_many = asyncio.run(amap())
+    assert results_many["ID3"] == results == mapper("ID1", "ID3", [1, 2, 1])
+    # The bookkeeping of the traversal (i.e. deduplicating and regrouping the ids) never runs on the event loop
+    assert threads
+    assert loop_thread not in threads
+
+
+def test_async_parallel_providers_timeout():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", AsyncMappingTable("ID1", "ID2", delay=1)),
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0, factor=3)),
+            ("ID1", "ID2", AsyncMappingTable("ID1", "ID2")),
+        ],
+        settings=IdMappingSettings(parallel_providers=True, provider_timeout=0.1),
+    )
+
+    start = time.monotonic()
+    assert asyncio.run(mapper.amap("ID1", "ID2", [1, 2])) == [[3, 2], [6, 4]]
+    assert time.monotonic() - start < 0.5
+
+
+def test_mapping_api(client):
+    manager.id_mapping = MappingManager(
+        [("ID1", "ID2", AsyncMappingTable("ID1", "ID2")), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))]
+    )
+
+    response = client.get("/api/idtype/ID1/")
+    assert response.status_code == 200
+    assert set(response.json()) == {"ID2", "ID3"}
+
+    response = client.post("/api/idtype/ID1/ID3/", json={"q": ["1", "2"]})
+    assert response.status_code == 200
+    assert response.json() == [["11", "1111", "111111"], ["22", "2222", "222222"]]
+
+    response = client.post("/api/idtype/ID1/ID3/", json={"q": ["1", "2"], "mode": "first"})
+    assert response.json() == ["11", "22"]
+
+    response = client.request("GET", "/api/idtype/ID1/ID2/search/", json={"q": "1"})
+    assert response.json() == [{"match": "1", "to": "11"}]
+
+
+def test_mapping_chunks():
+    mapper = MappingManager([("ID5", "ID6", OneToMoreMappingTable("ID5", "ID6"))])
+    assert list(mapper.map_chunks("ID5", "ID6", [1, 2, 3], 2)) == [[[1, 2, 3], [2, 4, 6]], [[3, 6, 9]]]
+    assert list(mapper.map_chunks("ID5", "ID6", [], 2)) == []
+
+
+def test_mapping_stream_api(client):
+    manager.id_mapping = MappingManager(
+        [("ID1", "ID2", AsyncMappingTable("ID1", "ID2")), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))]
+    )
+
+    with client.stream("POST", "/api/idtype/ID1/ID3/stream/", json={"q": ["1", "2", "3"], "chunk_size": 2}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.iter_lines()] == [
+            ["11", "1111", "111111"],
+            ["22", "2222", "222222"],
+            ["33", "3333", "333333"],
+        ]
+
+    response = client.post("/api/idtype/ID1/ID4/stream/", json={"q": ["1", "2"], "mode": "first"})
+    assert [json.loads(line) for line in response.iter_lines()] == [None, None]
+
+    response = client.post("/api/idtype/ID1/ID3/stream/", json={"q": ["1"], "chunk_size": 0})
+    assert response.status_code == 422
+
+
+def test_cost_aware_routing():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID3", CostlyMappingTable("ID1", "ID3", cost=5)),
+            ("ID1", "ID2", OneToOneMappingTable("ID1", "ID2")),
+            ("ID2", "ID3", OneToOneMappingTable("ID2", "ID3")),
+        ]
+    )
+
+    # Two cheap hops are preferred over a single costly one
+    assert mapper.can_map("ID1", "ID3") == [["ID1", "ID2", "ID3"]]
+    assert mapper("ID1", "ID3", [1]) == [[1]]
+    assert mapper.route_info("ID1", "ID3") == {
+        "from_idtype": "ID1",
+        "to_idtype": "ID3",
+        "path": ["ID1", "ID2", "ID3"],
+        "cost": 2.0,
+        "edges": [
+            {"from_idtype": "ID1", "to_idtype": "ID2", "cost": 1.0, "static_cost": 1.0, "calls": 1, "mean_duration": ANY, "hit_rate": 1.0},
+            {"from_idtype": "ID2", "to_idtype": "ID3", "cost": 1.0, "static_cost": 1.0, "calls": 1, "mean_duration": ANY, "hit_rate": 1.0},
+        ],
+    }
+    assert mapper.route_info("ID3", "ID1") is None
+
+
+def test_adaptive_routing():
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", SlowMappingTable("ID1", "ID2", delay=0.05, factor=1)),
+            ("ID2", "ID3", OneToOneMappingTable("ID2", "ID3")),
+            ("ID1", "ID4", OneToOneMappingTable("ID1", "ID4")),
+            ("ID4", "ID5", OneToOneMappingTable("ID4", "ID5")),
+            ("ID5", "ID3", OneToOneMappingTable("ID5", "ID3")),
+        ],
+        settings=IdMappingSettings(adaptive_routing=True, adaptive_routing_min_calls=1, adaptive_routing_interval=0),
+    )
+
+    assert mapper.can_map("ID1", "ID3") == [["ID1", "ID2", "ID3"]]
+    assert mapper("ID1", "ID3", [1]) == [[1]]
+    # Observe the edges of the fast route once, such that the slow edge is avoided afterwards
+    assert mapper("ID1", "ID5", [1]) == [[1]]
+    assert mapper("ID5", "ID3", [1]) == [[1]]
+    assert mapper("ID1", "ID3", [1]) == [[1]]
+    assert mapper.can_map("ID1", "ID3") == [["ID1", "ID4", "ID5", "ID3"]]
+    assert mapper.route_info("ID1", "ID3")["cost"] < 0.05
+
+
+def test_mapping_routes_api(client):
+    manager.id_mapping = MappingManager(
+        [
+            ("ID1", "ID2", OneToOneMappingTable("ID1", "ID2")),
+            ("ID2", "ID3", OneToOneMappingTable("ID2", "ID3")),
+            ("routes", "ID1", OneToOneMappingTable("routes", "ID1")),
+        ]
+    )
+
+    response = client.get("/api/idtype/_routes/")
+    assert response.status_code == 200
+    assert [(r["from_idtype"], r["to_idtype"], r["path"], r["cost"]) for r in response.json()] == [
+        ("ID1", "ID2", ["ID1", "ID2"], 1.0),
+        ("ID1", "ID3", ["ID1", "ID2", "ID3"], 2.0),
+        ("ID2", "ID3", ["ID2", "ID3"], 1.0),
+        ("routes", "ID1", ["routes", "ID1"], 1.0),
+        ("routes", "ID2", ["routes", "ID1", "ID2"], 2.0),
+        ("routes", "ID3", ["routes", "ID1", "ID2", "ID3"], 3.0),
+    ]
+    # The routes do not shadow an idtype named "routes"
+    assert client.get("/api/idtype/routes/").json() == ["ID1", "ID2", "ID3"]
+
+    response = client.get("/api/idtype/_routes/", params={"idtype": "ID1", "to_idtype": "ID3"})
+    assert [r["path"] for r in response.json()] == [["ID1", "ID2", "ID3"]]
+
+
+def test_materialized_mapping():
+    table = DictMappingTable("ID1", "ID2", {"a": ["b", "c"], "d": ["e"], "f": []})
+    counting = CountingMappingTable("ID2", "ID3")
+    mapper = MappingManager([("ID1", "ID2", table), ("ID2", "ID3", counting), ("ID3", "ID4", OneToOneMappingTable("ID3", "ID4"))])
+
+    assert mapper.materialize("ID3", "ID1") is None
+    assert mapper.materialize("ID2", "ID4") is None
+    assert len(mapper.materialize("ID1", "ID4")) == 3
+    assert mapper.is_materialized("ID1", "ID4")
+    assert counting.ids == ["b", "c", "e"]
+
+    # Only the id unknown to the table is mapped via the path
+    assert mapper("ID1", "ID4", ["d", "a", "x", "f"]) == [["e", "ee", "eee"], ["b", "bb", "bbb", "c", "cc", "ccc"], [], []]
+    assert asyncio.run(mapper.amap("ID1", "ID4", ["a", "d"])) == [["b", "bb", "bbb", "c", "cc", "ccc"], ["e", "ee", "eee"]]
+    assert counting.ids == ["b", "c", "e"]
+
+    # Tables not using the invalidated edge are kept
+    mapper.invalidate("ID3", "ID1")
+    assert mapper.is_materialized("ID1", "ID4")
+
+    table.data["a"] = ["x"]
+    mapper.invalidate("ID1", "ID2")
+    for _ in range(100):
+        if mapper.is_materialized("ID1", "ID4"):
+            break
+        time.sleep(0.01)
+    assert mapper("ID1", "ID4", ["a"]) == [["x", "xx", "xxx"]]
+
+
+def test_materialize_with_invalidations():
+    table = DictMappingTable("ID1", "ID2", {"a": ["b"]})
+    invalidating = InvalidatingMappingTable("ID2", "ID3")
+    mapper = MappingManager(
+        [("ID1", "ID2", table), ("ID2", "ID3", invalidating), ("ID5", "ID6", OneToOneMappingTable("ID5", "ID6"))],
+        IdMappingSettings(materialize_max_attempts=3),
+    )
+
+    # Invalidations of edges not on the path do not restart the build
+    invalidating.on_call = lambda: mapper.invalidate("ID5", "ID6")
+    assert mapper.materialize("ID1", "ID3") is not None
+    assert invalidating.calls == 1
+
+    # Invalidations of edges on the path restart the build, up to the configured number of attempts
+    invalidating.calls = 0
+    invalidating.on_call = lambda: mapper.invalidate("ID2", "ID3")
+    assert mapper.materialize("ID1", "ID3") is None
+    assert invalidating.calls == 3
+    assert not mapper.is_materialized("ID1", "ID3")
+
+
+def test_search_index():
+    index = SearchIndex()
+    index.add_many([("BRCA2", 2), ("BRCA1", 1), ("brca", 0), ("ABRCA", 3), ("TP53", 4)])
+
+    assert index.search("brca") == [
+        {"match": "brca", "to": 0},
+        {"match": "BRCA1", "to": 1},
+        {"match": "BRCA2", "to": 2},
+        {"match": "ABRCA", "to": 3},
+    ]
+    assert index.search("BRC", 2) == [{"match": "brca", "to": 0}, {"match": "BRCA1", "to": 1}]
+    # Queries shorter than the n-gram size only match prefixes
+    assert index.search("br") == [{"match": "brca", "to": 0}, {"match": "BRCA1", "to": 1}, {"match": "BRCA2", "to": 2}]
+    assert index.search("rca2") == [{"match": "BRCA2", "to": 2}]
+    assert index.search("xyz") == []
+    assert index.search("") == []
+
+
+def test_search_index_concurrent():
+    import sys
+    import threading
+
+    names = [(f"name{i}", i) for i in range(200)]
+    interval = sys.getswitchinterval()
+    # Switch threads often, such that searches run while another one is sorting the index
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(50):
+            index = SearchIndex()
+            index.add_many(names)
+            barrier = threading.Barrier(8)
+
+            def search(query, index=index, barrier=barrier):
+                barrier.wait()
+                return index.search(query)
+
+            # Concurrent searches all sort the index on first use, but must never see a partially built one
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(search, ["na"] * 8))
+            assert [len(r) for r in results] == [len(names)] * 8
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def test_ranked_search():
+    indexed = IndexedMappingTable("ID1", "ID2", [("BRCA2", "2"), ("BRCA1", "1"), ("ABRCA", "3")])
+    legacy = SearchMappingTable("ID1", "ID2", [{"match": "BRCA1", "to": "1"}, {"match": "BRCA", "to": "0"}, {"match": "XBRCA", "to": "4"}])
+    mapper = MappingManager([("ID1", "ID2", legacy), ("ID1", "ID2", indexed)])
+
+    expected = [{"match": "BRCA", "to": "0"}, {"match": "BRCA1", "to": "1"}, {"match": "BRCA2", "to": "2"}]
+    assert mapper.search("ID1", "ID2", "brca", 3) == expected
+    assert asyncio.run(mapper.asearch("ID1", "ID2", "brca", 3)) == expected
+    assert len(mapper.search("ID1", "ID2", "brca", None)) == 5
+    assert mapper.search("ID2", "ID1", "brca", 3) == []
+
+
+def test_grouped_mapping():
+    grouped = GroupedMappingTable("ID1", "ID2")
+    mapper = MappingManager([("ID1", "ID2", grouped), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))])
+
+    assert mapper("ID1", "ID2", [3, 1, 2, 1]) == [[6], [], [4], []]
+    assert grouped.calls == 1
+    assert mapper("ID1", "ID3", [2, 3]) == [[4, 8, 12], [6, 12, 18]]
+    assert grouped.calls == 2
+
+
+def test_array_mapping_table(tmp_path):
+    pytest.importorskip("numpy")
+    from visyn_core.id_mapping.array_table import ArrayMappingTable, build_array_mapping_table
+
+    pairs = [("b", "2"), ("a", "1"), ("b", "20"), ("c", "3"), ("b", "2"), ("abc", "123")]
+    assert build_array_mapping_table(tmp_path / "table", "ID1", "ID2", pairs) == 4
+
+    table = ArrayMappingTable(tmp_path / "table")
+    assert (table.from_idtype, table.to_idtype) == ("ID1", "ID2")
+    assert sorted(table.keys()) == ["a", "abc", "b", "c"]
+    assert table(["b", "x", "a", "abcd", "ab", "c"]) == [["2", "20"], [], ["1"], [], [], ["3"]]
+    assert table([]) == []
+
+    mapper = MappingManager([("ID1", "ID2", table), ("ID2", "ID3", OneToTwoMappingTable("ID2", "ID3"))])
+    assert mapper("ID1", "ID3", ["a", "zzz"]) == [["11"], []]
+
+    build_array_mapping_table(tmp_path / "ints", "ID1", "ID2", [(1, 10), (3, 30), (1, 11), (3, 10)], integer_ids=True, reversible=True)
+    ints = ArrayMappingTable(tmp_path / "ints")
+    assert ints([3, 2, 1]) == [[30, 10], [], [10, 11]]
+    # Ids which are no integers are not found
+    assert ints(["1", "ENSG01", None, 2**70, "3"]) == [[10, 11], [], [], [], [30, 10]]
+    assert ints([3, 2, 1], first_only=True) == [[30], [], [10]]
+    assert list(ints.items()) == [(1, [10, 11]), (3, [30, 10])]
+    assert MappingManager([("ID1", "ID2", ints)])("ID2", "ID1", [10, 30, 12]) == [[1, 3], [3], []]
+
+    build_array_mapping_table(tmp_path / "empty", "ID1", "ID2", [])
+    assert ArrayMappingTable(tmp_path / "empty")(["a"]) == [[]]
+
+
+def test_build_mapping_table_command(tmp_path):
+    pytest.importorskip("numpy")
+    import argparse
+
+    from visyn_core.id_mapping.array_table import ArrayMappingTable, create_build_mapping_table_command
+
+    (tmp_path / "mapping.csv").write_text("gene;symbol\nENSG1;BRCA1\nENSG2;BRCA2\n")
+    parser = argparse.ArgumentParser()
+    launcher = create_build_mapping_table_command(parser)
+    args = parser.parse_args(
+        [
+            *(str(tmp_path / "table"), "--from-idtype", "Ensembl", "--to-idtype", "GeneSymbol", "--csv", str(tmp_path / "mapping.csv")),
+            *("--delimiter", ";", "--from-column", "symbol", "--to-column", "gene"),
+        ]
+    )
+    launcher(args)()
+
+    assert ArrayMappingTable(tmp_path / "table")(["BRCA2", "ENSG1"]) == [["ENSG2"], []]
+
+
+@pytest.fixture
+def mapping_engine():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import StaticPool
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as conn:
+        conn.execute(text("create table mapping (from_id integer, to_id text)"))
+        conn.execute(
+            text("insert into mapping values (:f, :t)"),
+            [{"f": i, "t": f"T{i}"} for i in range(100)] + [{"f": 1, "t": "T1b"}],
+        )
+    return engine
+
+
+@pytest.mark.parametrize(
+    ("db_chunk_size", "db_temp_table_threshold"),
+    [(1000, 10_000), (3, 10_000), (3, 5)],
+)
+def test_db_mapping(mapping_engine, db_chunk_size, db_temp_table_threshold):
+    from sqlalchemy import inspect
+
+    from visyn_core.dbview import DBMapping
+    from visyn_core.id_mapping.db_mapping import DBMappingTable
+
+    mapping = DBMapping("ID1", "ID2", "select from_id as f, to_id as t from mapping where from_id in :ids order by t", integer_ids=True)
+    settings = IdMappingSettings(db_chunk_size=db_chunk_size, db_temp_table_threshold=db_temp_table_threshold)
+    table = DBMappingTable(mapping_engine, mapping, settings)
+
+    ids = ["5", "1", "500", "7", "5", "42", "99", "0"]
+    assert table(ids) == [["T5"], ["T1", "T1b"], [], ["T7"], ["T5"], ["T42"], ["T99"], ["T0"]]
+    assert table([]) == []
+    # Ids which are no integers are not found
+    assert table(["1", "ENSG01", None, "5"]) == [["T1", "T1b"], [], [], ["T5"]]
+    assert table(["ENSG01"]) == [[]]
+    assert table(["1", "5", "500"], first_only=True) == [["T1"], ["T5"], []]
+    # Temporary tables are dropped again
+    assert inspect(mapping_engine).get_temp_table_names() == []
+
+    mapper = MappingManager([("ID1", "ID2", table)])
+    assert mapper("ID1", "ID2", ["2", "1"]) == [["T2"], ["T1", "T1b"]]
+
+
+def test_db_mapping_provider(client, mapping_engine):
+    from types import SimpleNamespace
+
+    from visyn_core.dbview import DBMapping
+    from visyn_core.id_mapping.db_mapping import create_db_mapping_provider
+
+    connector = SimpleNamespace(mappings=[DBMapping("ID1", "ID2", "select from_id as f, to_id as t from mapping where from_id in :ids")])
+    with patch.object(manager.db, "connectors", {"mapping": connector}), patch.object(manager.db, "engine", lambda _: mapping_engine):
+        # Database mappings are only registered if enabled
+        assert list(create_db_mapping_provider()) == []
+        with patch.object(manager.settings.visyn_core.id_mapping, "db_mappings", True):
+            assert [(from_idtype, to_idtype) for from_idtype, to_idtype, _ in create_db_mapping_provider()] == [("ID1", "ID2")]
+
+
+def test_map_many():
+    counting = CountingMappingTable("ID1", "ID2")
+    mapper = MappingManager(
+        [
+            ("ID1", "ID2", counting),
+            ("ID2", "ID3", OneToTwoMappingTable("ID2", "ID3")),
+            ("ID2", "ID4", OneToMoreMappingTable("ID2", "ID4")),
+            ("ID3", "ID5", OneToOneMappingTable("ID3", "ID5")),
+        ]
+    )
+
+    ids = [1, 2, 1]
+    targets = ["ID5", "ID4", "ID1", "ID2", "ID6", "ID3"]
+    results = mapper.map_many("ID1", targets, ids)
+    assert list(results) == targets
+    # The shared first hop is only resolved once for all four targets
+    assert counting.ids == [1, 2]
+    for to_idtype in ["ID2", "ID3", "ID4", "ID5"]:
+        assert results[to_idtype] == mapper("ID1", to_idtype, ids)
+    assert results["ID1"] == ids
+    assert results["ID6"] == [None, None, None]
+
+    assert asyncio.run(mapper.amap_many("ID1", targets, ids)) == results
+
+
+def test_map_many_api(client):
+    manager.id_mapping = MappingManager(
+        [("ID1", "ID2", OneToOneMappingTable("ID1", "ID2")), ("ID2", "ID3", OneToTwoMappingTable("ID2", "ID3"))]
+    )
+
+    response = client.post("/api/idtype/ID1/", json={"q": ["1", "2"], "to": ["ID3", "ID2"]})
+    assert response.status_code == 200
+    assert response.json() == {"ID3": [["11"], ["22"]], "ID2": [["1"], ["2"]]}
+
+    response = client.post("/api/idtype/ID1/", json={"q": ["1"], "to": ["ID2", "ID4"], "mode": "first"})
+    assert response.json() == {"ID2": ["1"], "ID4": [None]}
+
+
+def test_first_only_mapping():
+    counting = CountingMappingTable("ID2", "ID3")
+    mapper = MappingManager([("ID1", "ID2", OneToMoreMappingTable("ID1", "ID2")), ("ID2", "ID3", counting)])
+
+    assert mapper("ID1", "ID3", [1, 2], first_only=True) == [[1], [2]]
+    # Only the first candidate of the first hop is mapped further
+    assert counting.ids == [1, 2]
+    assert to_first(mapper("ID1", "ID3", [1, 2])) == [1, 2]
+    assert asyncio.run(mapper.amap("ID1", "ID3", [1, 2], first_only=True)) == [[1], [2]]
+    assert mapper.map_many("ID1", ["ID2", "ID3"], [1], first_only=True) == {"ID2": [[1]], "ID3": [[1]]}
+
+
+def test_first_only_skips_secondary_mappers():
+    primary = DictMappingTable("ID1", "ID2", {1: ["a", "b"], 2: []})
+    secondary = CountingMappingTable("ID1", "ID2")
+    mapper = MappingManager(
+        [("ID1", "ID2", primary), ("ID1", "ID2", secondary)],
+        settings=IdMappingSettings(cache=IdMappingCacheSettings(enabled=True)),
+    )
+
+    assert mapper("ID1", "ID2", [1, 2, 3], first_only=True) == [["a"], [2], [3]]
+    # The secondary mapper is only called for the ids which the primary one could not map
+    assert secondary.ids == [2, 3]
+    assert asyncio.run(mapper.amap("ID1", "ID2", [1, 2], first_only=True)) == [["a"], [2]]
+    # Incomplete results are not cached
+    assert mapper("ID1", "ID2", [1]) == [["a", "b", 1, 2, 3]]
+
+
+def test_first_only_hint():
+    hinted = FirstOnlyMappingTable("ID1", "ID2")
+    mapper = MappingManager(
+        [("ID1", "ID2", hinted), ("ID2", "ID3", OneToMoreMappingTable("ID2", "ID3"))],
+        settings=IdMappingSettings(cache=IdMappingCacheSettings(enabled=True)),
+    )
+
+    # Mappers accepting `first_only` are asked for the first mapped id only
+    assert mapper("ID1", "ID3", [1, 2], first_only=True) == [[1], [2]]
+    assert asyncio.run(mapper.amap("ID1", "ID3", [3], first_only=True)) == [[3]]
+    assert hinted.hints == [True, True]
+    # Their truncated results are not cached
+    assert mapper("ID1", "ID2", [1, 2]) == [[1, 2, 3], [2, 4, 6]]
+    assert hinted.hints == [True, True, False]
+
+
+def test_add_and_remove_provider():
+    mapper = MappingManager([("ID1", "ID2", OneToOneMappingTable("ID1", "ID2")), ("ID3", "ID4", OneToOneMappingTable("ID3", "ID4"))])
+    assert mapper.maps_to("ID1") == ["ID2"]
+    assert mapper.maps_to("ID3") == ["ID4"]
+
+    two_to_three = OneToTwoMappingTable("ID2", "ID3")
+    mapper.add_provider("ID2", "ID3", two_to_three)
+    assert mapper.maps_to("ID1") == ["ID2", "ID3", "ID4"]
+    assert mapper("ID1", "ID4", [1]) == [[2]]
+    # Routes of sources which cannot reach the new edge are kept
+    assert mapper.maps_to("ID3") == ["ID4"]
+
+    shortcut = OneToOneMappingTable("ID1", "ID4")
+    mapper.add_provider("ID1", "ID4", shortcut)
+    assert mapper.can_map("ID1", "ID4") == [["ID1", "ID4"]]
+
+    assert mapper.remove_provider("ID2", "ID3", two_to_three)
+    assert not mapper.remove_provider("ID2", "ID3", two_to_three)
+    assert mapper.maps_to("ID1") == ["ID2", "ID4"]
+    assert mapper.maps_to("ID2") == []
+
+    assert mapper.remove_provider("ID1", "ID4", shortcut)
+    assert mapper.maps_to("ID1") == ["ID2"]
+    assert mapper("ID1", "ID4", [1]) == [None]
+
+
+def test_reverse_mapping():
+    forward = ReversibleMappingTable("ID1", "ID2", {"a": ["x", "y"], "b": ["y"], "c": [], "d": ["z", "x"]})
+    mapper = MappingManager([("ID1", "ID2", forward)], settings=IdMappingSettings(cache=IdMappingCacheSettings(enabled=True)))
+    assert mapper.maps_to("ID2") == ["ID1"]
+    # The inverted index is only built on first use
+    assert forward.items_calls == 0
+    assert mapper("ID2", "ID1", ["y", "q", "x", "z"]) == [["a", "b"], [], ["a", "d"], ["d"]]
+    assert mapper("ID2", "ID1", ["x"]) == [["a", "d"]]
+    assert forward.items_calls == 1
+
+    forward.data["e"] = ["q"]
+    mapper.invalidate("ID1", "ID2")
+    assert mapper("ID2", "ID1", ["q"]) == [["e"]]
+    assert forward.items_calls == 2
+
+    # Hand-written reverse providers take precedence over derived ones
+    explicit = DictMappingTable("ID2", "ID1", {"x": ["explicit"]})
+    mapper.add_provider("ID2", "ID1", explicit)
+    assert mapper("ID2", "ID1", ["x"]) == [["explicit"]]
+    assert MappingManager([("ID1", "ID2", forward), ("ID2", "ID1", explicit)]).mappers["ID2"]["ID1"] == [explicit]
+
+    other = MappingManager([("ID1", "ID2", forward)])
+    assert other.remove_provider("ID1", "ID2", forward)
+    assert other.known_idtypes() == set()
+    other.add_provider("ID1", "ID2", forward)
+    assert other("ID2", "ID1", ["y"]) == [["a", "b"]]
+
+
+def test_remove_provider_with_reverse_mapping():
+    forward = ReversibleMappingTable("ID1", "ID2", {"a": ["x"], "b": ["y"]})
+    explicit = DictMappingTable("ID2", "ID1", {"x": ["explicit"]})
+    mapper = MappingManager([("ID1", "ID2", forward), ("ID2", "ID1", explicit)])
+    assert mapper("ID2", "ID1", ["x", "y"]) == [["explicit"], []]
+
+    # Removing the hand-written reverse provider derives the reverse edge again
+    assert mapper.remove_provider("ID2", "ID1", explicit)
+    assert mapper("ID2", "ID1", ["x", "y"]) == [["a"], ["b"]]
+    assert mapper.maps_to("ID2") == ["ID1"]
+
+    # A mapper registered on multiple edges only loses the reverse edge of the removed one
+    shared = ReversibleMappingTable("ID1", "ID2", {"a": ["x"]})
+    mapper = MappingManager([("ID1", "ID2", shared), ("ID3", "ID4", shared)])
+    assert mapper.remove_provider("ID1", "ID2", shared)
+    assert mapper.maps_to("ID2") == []
+    assert mapper("ID4", "ID3", ["x"]) == [["a"]]
+
+
+def test_add_provider_invalidates_cache():
+    mapper = MappingManager(
+        [("ID1", "ID2", DictMappingTable("ID1", "ID2", {1: ["a"]}))],
+        settings=IdMappingSettings(cache=IdMappingCacheSettings(enabled=True)),
+    )
+    assert mapper("ID1", "ID2", [1, 2]) == [["a"], []]
+
+    second = DictMappingTable("ID1", "ID2", {2: ["b"]})
+    mapper.add_provider("ID1", "ID2", second)
+    assert mapper("ID1", "ID2", [1, 2]) == [["a"], ["b"]]
+
+    mapper.remove_provider("ID1", "ID2", second)
+    assert mapper("ID1", "ID2", [1, 2]) == [["a"], []]
+
+
+def test_add_provider_concurrently():
+    mapper = MappingManager([("ID0", "ID1", OneToOneMappingTable("ID0", "ID1"))])
+
+    def add(i):
+        mapper.add_provider(f"ID{i}", f"ID{i + 1}", OneToOneMappingTable(f"ID{i}", f"ID{i + 1}"))
+        return mapper.can_map("ID0", f"ID{i + 1}")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(add, range(1, 50)))
+
+    assert mapper.can_map("ID0", "ID50") == [[f"ID{i}" for i in range(51)]]
+    assert mapper("ID0", "ID50", [1]) == [[1]]
+
+
+@pytest.mark.parametrize(
+    "workspace_config",
+    [
+        {
+            "visyn_core": {
+                "enabled_plugins": ["visyn_core"],
+                "security": {"store": {"no_security_store": {"enable": True}}},
+                "celery": {
+                    "broker": "memory://localhost/",
+                    "result_backend": "cache+memory://",
+                    "task_always_eager": True,
+                    "task_store_eager_result": True,
+                },
+            },
+        }
+    ],
+)
+def test_mapping_job_api(client):
+    manager.id_mapping = MappingManager(
+        [("ID1", "ID2", OneToMoreMappingTable("ID1", "ID2")), ("jobs", "ID2", OneToOneMappingTable("jobs", "ID2"))]
+    )
+    # The jobs do not shadow the mappings of an idtype named "jobs"
+    assert client.post("/api/idtype/jobs/ID2/", json={"q": ["1"]}).json() == [["1"]]
+    assert client.request("GET", "/api/idtype/jobs/ID2/", json={"q": ["1"]}).json() == [["1"]]
+
+    response = client.post("/api/idtype/ID1/ID2/jobs/", json={"q": ["1", "2", "3"], "chunk_size": 2})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["total"] == 3
+
+    response = client.get(f"/api/idtype/_jobs/{job['id']}/")
+    assert response.json() == {"id": job["id"], "state": "SUCCESS", "done": 3, "total": 3, "error": None}
+    # The result only contains the counts, the mapped ids are stored separately in the key-value result backend
+    assert manager.celery.AsyncResult(job["id"]).result == {"done": 3, "total": 3}
+
+    response = client.get(f"/api/idtype/_jobs/{job['id']}/result/")
+    assert response.status_code == 200
+    assert response.headers["content-disposition"] == f'attachment; filename="{job["id"]}.ndjson"'
+    assert [json.loads(line) for line in response.text.splitlines()] == [["1", "11", "111"], ["2", "22", "222"], ["3", "33", "333"]]
+
+    job = client.post("/api/idtype/ID1/ID2/jobs/", json={"q": ["1", "2"], "mode": "first"}).json()
+    assert client.get(f"/api/idtype/_jobs/{job['id']}/result/").text == '"1"\n"2"\n'
+
+    # Unknown jobs are pending and have no result yet
+    assert client.get("/api/idtype/_jobs/unknown/").json()["state"] == "PENDING"
+    assert client.get("/api/idtype/_jobs/unknown/result/").status_code == 409
+
+
+def test_mapping_job_progress():
+    from visyn_core.id_mapping.tasks import map_ids
+
+    manager.id_mapping = MappingManager([("ID1", "ID2", OneToOneMappingTable("ID1", "ID2"))])
+    with patch.object(map_ids, "update_state") as update_state:
+        assert map_ids.run("ID1", "ID2", [1, 2, 3, 4, 5], chunk_size=2) == {"done": 5, "total": 5, "mapped": [[1], [2], [3], [4], [5]]}
+    assert [call.kwargs for call in update_state.call_args_list] == [
+        {"state": "PROGRESS", "meta": {"done": done, "total": 5}} for done in [0, 2, 4, 5]
+    ]
+
+
+def test_benchmarks():
+    from visyn_core.tests.benchmarks.bench_id_mapping import SUITES, run
+
+    # Smoke test with tiny sizes, such that the benchmarks keep working as the manager changes
+    results = run(SUITES, sizes=[5], edges_per_idtype=2, ids=[20], repeat=1)
+    assert list(results) == SUITES
+    assert json.loads(json.dumps(results)) == results
+    assert results["call"][0]["ids"] == 20
+
+
+def test_mapping_telemetry():
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from visyn_core.id_mapping.telemetry import MappingTelemetry
+
+    reader = InMemoryMetricReader()
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    telemetry = MappingTelemetry(meter_provider=MeterProvider(metric_readers=[reader]), tracer_provider=tracer_provider)
+    mapper = MappingManager(
+        [("ID1", "ID2", OneToMoreMappingTable("ID1", "ID2")), ("ID2", "ID3", AsyncMappingTable("ID2", "ID3"))], telemetry=telemetry
+    )
+
+    asyncio.run(mapper.amap("ID1", "ID3", [1, 2]))
+
+    spans = exporter.get_finished_spans()
+    assert [(span.attributes["id_mapping.from_idtype"], span.attributes["id_mapping.ids_in"]) for span in spans] == [("ID1", 2), ("ID2", 5)]
+    assert spans[0].attributes["id_mapping.ids_out"] == 6
+
+    metrics = {
+        metric.name: metric.data.data_points
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    assert set(metrics) == {"id_mapping.ids_in", "id_mapping.ids_out", "id_mapping.fan_out", "id_mapping.duration"}
+    fan_out = {point.attributes["provider"]: point for point in metrics["id_mapping.fan_out"]}
+    assert fan_out["OneToMoreMappingTable"].sum == 3
+    assert fan_out["OneToMoreMappingTable"].attributes == {"from_idtype": "ID1", "to_idtype": "ID2", "provider": "OneToMoreMappingTable"}
+    assert fan_out["AsyncMappingTable"].sum == 1
+
+
+def test_csr_mapping():
+    from visyn_core.id_mapping.csr import CSRMapping
+
+    mapping = CSRMapping.from_ids(["a", "b", "c"])
+    assert mapping.regroup([["x"], None, ["y", "z"]]) == [["x"], None, ["y", "z"]]
+
+    # The first hop maps a to x, y and c to y, b is unmapped
+    mapping = mapping.then([["x", "y"], None, ["y"]])
+    assert mapping.values == ["x", "y"]
+    assert (mapping.offsets, mapping.indices) == ([0, 2, 2, 3], [0, 1, 1])
+
+    # One-to-one hops keep the offsets of the rows
+    one_to_one = mapping.then([["X"], ["Y"]])
+    assert (one_to_one.values, one_to_one.offsets, one_to_one.indices) == (["X", "Y"], [0, 2, 2, 3], [0, 1, 1])
+
+    # One-to-many hops concatenate the results of the values of every row
+    one_to_many = mapping.then([["1", "2"], []])
+    assert (one_to_many.values, one_to_many.offsets, one_to_many.indices) == (["1", "2"], [0, 2, 2, 2], [0, 1])
+    assert mapping.regroup([["1", "2"], ["3"]]) == [["1", "2", "3"], [], ["3"]]